@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for the visitor Excel export.
+Compares the old path (a regular openpyxl Workbook holding every cell until
+save) with exports.write_xlsx (write-only worksheet fed row by row) on peak
+memory and time, at 100k and 1M rows. Each run is a fresh subprocess so its
+peak RSS is its own. Rows are synthetic values() dicts shaped like
+exports.FIELDS, so no database is needed.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import django
+from datetime import date, datetime, time as clock, timedelta, timezone
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+import openpyxl
+from visitorapi import exports
+
+SIZES = [int(n) for n in os.environ.get('BENCHMARK_ROWS', '100000,1000000').split(',')]
+# The old path needs several GB at 1M rows; only run it up to this many
+OLD_MAX_ROWS = int(os.environ.get('BENCHMARK_OLD_MAX_ROWS', '100000'))
+
+
+def fake_values(count):
+    """values() rows like exports.fetch() yields, one day checked in and out"""
+    start = datetime(2024, 1, 1, 9, tzinfo=timezone.utc)
+    for n in range(count):
+        row = dict.fromkeys(exports.FIELDS)
+        row.update({
+            'visitor_id': n, 'visitor__first_name': 'Test', 'visitor__last_name': f'Visitor {n}',
+            'visitor__email': f'visitor{n}@example.com', 'visitor__phone': '9999999999',
+            'visitor__company': 'Test Company', 'visitor__id_proof_type': 'Aadhar',
+            'visitor__id_proof_number': f'{n:012d}', 'reference_purpose': 'Meeting',
+            'start_time': clock(9, 30), 'end_time': clock(17, 0), 'valid_upto': date(2024, 1, 2),
+            'visitorcard__card_number': f'VC-{n:08d}', 'host_id': 1, 'host__first_name': 'Host',
+            'host__user_type': 'HR', 'day_1_checkin': start + timedelta(minutes=n),
+            'day_1_checkout': start + timedelta(minutes=n, hours=8),
+        })
+        yield row
+
+
+def old_export(file, rows):
+    """export_visitors_excel as it was: every cell kept in a Workbook until save"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Visitors'
+    ws.append(exports.HEADERS)
+    kinds = [column.kind for column in exports.COLUMNS]
+    for row in rows:
+        ws.append([exports.as_text(kind, value) for kind, value in zip(kinds, row)])
+    wb.save(file)
+
+
+def new_export(file, rows):
+    exports.write_xlsx(file, 'Visitors', rows)
+
+
+EXPORTS = {'old': old_export, 'write-only': new_export}
+
+
+def measure(label, count):
+    """Run one export in this process; prints seconds, RSS growth in kB and file bytes"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryFile() as file:
+        start = time.perf_counter()
+        EXPORTS[label](file, exports.typed_rows(fake_values(count)))
+        elapsed = time.perf_counter() - start
+        size = file.seek(0, os.SEEK_END)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(elapsed, peak - baseline, size)
+
+
+def run(label, count):
+    output = subprocess.run(
+        [sys.executable, __file__, label, str(count)], check=True, capture_output=True, text=True,
+    ).stdout.split()
+    elapsed, peak, size = float(output[0]), int(output[1]) * 1024, int(output[2])
+    print(f"{label:<12} {count:>9,} rows {elapsed:8.1f} s {peak / 2**20:9.1f} MB peak {size / 2**20:8.1f} MB file")
+    return peak
+
+
+def benchmark_export():
+    print(f"Visitor Excel export, {len(exports.COLUMNS)} columns")
+    print("=" * 70)
+    peaks = []
+    for count in SIZES:
+        if count <= OLD_MAX_ROWS:
+            run("old", count)
+        peaks.append(run("write-only", count))
+    if len(peaks) > 1:
+        print(f"\n✓ write-only peak memory {peaks[0] / 2**20:.1f} MB at {SIZES[0]:,} rows, "
+              f"{peaks[-1] / 2**20:.1f} MB at {SIZES[-1]:,} rows")
+    return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        measure(sys.argv[1], int(sys.argv[2]))
+    else:
+        sys.exit(0 if benchmark_export() else 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for visitor card QR rendering.
+Compares the old path (ERROR_CORRECT_H, RGBA copy, per-pixel transparency
+loop in Python) with qr_render.render_png (1-bit palette PNG with a
+transparent index) on time per card and bytes per file.
+"""
+import os
+import sys
+import time
+import django
+from datetime import date, timedelta
+from io import BytesIO
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+import qrcode
+from visitorapi import qr_payload
+from visitorapi.qr_render import render_png
+
+CARDS = int(os.environ.get('BENCHMARK_CARDS', '100'))
+
+
+def old_render_png(qr_data):
+    """generate_and_save_qr_code as it was before palette output"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=10,
+        border=2,
+    )
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
+    datas = img.getdata()
+    newData = []
+    for item in datas:
+        if item[0] > 200 and item[1] > 200 and item[2] > 200:
+            newData.append((255, 255, 255, 0))
+        else:
+            newData.append(item)
+    img.putdata(newData)
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def run(label, render, payloads):
+    start = time.perf_counter()
+    sizes = [len(render(data)) for data in payloads]
+    elapsed = time.perf_counter() - start
+    per_card = elapsed / len(payloads) * 1000
+    print(f"{label:<32} {per_card:8.2f} ms/card {sum(sizes) / len(sizes):8.0f} bytes/file")
+    return per_card, sum(sizes) / len(sizes)
+
+
+def benchmark_qr_render():
+    print(f"QR rendering, {CARDS} cards")
+    print("=" * 70)
+    today = date.today()
+    card_numbers = [f"VC-{n:08d}" for n in range(CARDS)]
+    legacy = [f"{number}|Test Visitor (Test Company)|{today}" for number in card_numbers]
+    signed = [qr_payload.encode(number, today, today + timedelta(days=2)) for number in card_numbers]
+
+    old_ms, old_bytes = run("old (H, RGBA, pixel loop)", old_render_png, legacy)
+    new_ms, new_bytes = run("new (M, 1-bit palette)", render_png, signed)
+    run("new renderer, legacy payload", render_png, legacy)
+    print(f"\n✓ {old_ms / new_ms:.1f}x faster per card, files {old_bytes / new_bytes:.1f}x smaller")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_qr_render() else 1)
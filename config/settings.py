@@ -286,3 +286,79 @@ CSRF_TRUSTED_ORIGINS = [
     'https://www.rskvms.shop',
     'https://rskvm.onrender.com',
 ]
+
+# Maximum number of visitors on site at once (HR + HOS). Check-ins at the gate are
+# refused once this is reached. 0 disables the limit.
+SITE_CAPACITY = int(os.environ.get('SITE_CAPACITY', '0'))
+
+# Live dashboard updates (server-sent events, served by config.asgi)
+DASHBOARD_EVENT_POLL_SECONDS = 2       # how often an open stream checks for new events
+DASHBOARD_EVENT_STREAM_SECONDS = 300   # streams are closed after this and the browser reconnects
+DASHBOARD_EVENT_RETENTION_MINUTES = 60 # older events are pruned
+
+# Batch scan ingestion for kiosks (/scans/batch/)
+SCAN_BATCH_MAX_SIZE = 200       # scans accepted per request
+SCAN_RECORD_RETENTION_DAYS = 7  # how long idempotency keys are remembered for replays
+
+# Repeat scans of a card within this many seconds get the first reply back (0 = off)
+SCAN_DEDUPE_SECONDS = {'checkin': 3, 'checkout': 3}
+
+# Kiosk scan metrics at /metrics/ are shown to staff users, or to a scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>" when this is set
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Kiosk ids (X-Kiosk-Id, set with /checkout-page/?kiosk=<id>) that get their own gate label
+# in the scan metrics, comma separated; scans from any other kiosk are labelled "other"
+KIOSK_GATES = [gate.strip() for gate in os.environ.get('KIOSK_GATES', '').split(',') if gate.strip()]
+
+# Per-process cache of card lookups for the kiosk endpoints (/card-cache/stats/)
+CARD_CACHE_SIZE = 1024   # cards kept, least recently scanned evicted first
+CARD_CACHE_SECONDS = 60  # other workers see card/visit edits after at most this long
+
+# Card QRs are rendered on demand at /cards/<card>/qr/... and cached by browsers. Set
+# QR_STORE_FILES=True to keep storing a PNG per card instead; those are rendered by
+# `manage.py render_qr_codes`. Set QR_RENDER_WORKER=True when that worker runs; otherwise
+# the print page renders its cards itself while it waits.
+QR_STORE_FILES = os.environ.get('QR_STORE_FILES', 'False') == 'True'
+QR_RENDER_WORKER = os.environ.get('QR_RENDER_WORKER', 'False') == 'True'
+QR_RENDER_FALLBACK_SECONDS = 30  # with a worker, cards pending longer than this are rendered inline
+QR_RENDER_INLINE_BATCH = 20      # cards rendered inline per print page poll
+
+# Reception print queue (/print-card/): approved visits dated within this many days of
+# today whose card is not printed yet, PRINT_CARD_PAGE_SIZE cards per page
+PRINT_CARD_DAYS = 7
+PRINT_CARD_PAGE_SIZE = 48
+
+# Background visit exports (/exports/). Set EXPORT_JOB_WORKER=True when
+# `manage.py run_export_jobs` runs; otherwise the web process builds each export in a
+# thread. Finished files are downloadable for EXPORT_JOB_EXPIRY_HOURS, then removed by
+# `manage.py cleanup_export_jobs`.
+EXPORT_JOB_WORKER = os.environ.get('EXPORT_JOB_WORKER', 'False') == 'True'
+EXPORT_JOB_EXPIRY_HOURS = 24
+EXPORT_JOB_STALE_MINUTES = 15  # running jobs with no progress for this long have lost their worker
+
+# Server-side card PDFs (/print-card/pdf/): batches of at least this many cards are drawn
+# in a process pool of CARD_PDF_PROCESSES (default: one per CPU)
+CARD_PDF_POOL_MIN_CARDS = 40
+CARD_PDF_PROCESSES = int(os.environ.get('CARD_PDF_PROCESSES', '0')) or None
+
+# Signed QR payloads on visitor cards. Cards are signed with QR_SIGNING_KEY (falls back
+# to SECRET_KEY); changing it invalidates every printed signed card.
+QR_SIGNING_KEY = os.environ.get('QR_SIGNING_KEY', '')
+QR_ACCEPT_LEGACY = os.environ.get('QR_ACCEPT_LEGACY', 'True') == 'True'  # unsigned cards printed before V1
+
+# Cache for computed dashboard data. Set REDIS_URL (needs the redis package) to share
+# it between workers; otherwise each process keeps its own in-memory cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+DASHBOARD_CACHE_SECONDS = 30  # upper bound on staleness when the cache is per-process
@@ -35,6 +35,9 @@ urlpatterns = [
     path('search_visitors/', visitorapi_views.search_visitors, name='search-visitors-api'),
     path('export-visitors-excel/', visitorapi_views.export_visitors_excel, name='export_visitors_excel'),
     path('export-hos-visitors-excel/', visitorapi_views.export_hos_visitors_excel, name='export_hos_visitors_excel'),
+    path('exports/', visitorapi_views.start_export_job, name='start_export_job'),
+    path('exports/<int:job_id>/', visitorapi_views.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', visitorapi_views.export_job_download, name='export_job_download'),
     path('registration-login/', visitorapi_views.registration_user_login_view, name='registration-login'),
     path('registration-users-list/', visitorapi_views.registration_users_list, name='registration-users-list'),
     path('add-registration-user/', visitorapi_views.add_registration_user, name='add-registration-user'),
@@ -49,15 +52,26 @@ urlpatterns = [
     path('hos-logout/', visitorapi_views.hos_logout_view, name='hos-logout'),
     path('print-card/', visitorapi_views.print_card_dashboard, name='print_card_dashboard'),
     path('print-card/step-2/', visitorapi_views.print_card_step2, name='print_card_step2'),
+    path('print-card/qr-status/', visitorapi_views.print_card_qr_status, name='print_card_qr_status'),
+    path('print-card/pdf/', visitorapi_views.print_cards_pdf, name='print_cards_pdf'),
+    path('cards/<str:card_number>/qr/<str:token>.<str:fmt>', visitorapi_views.card_qr, name='card_qr'),
     path('print-card/mark-printed/', visitorapi_views.mark_cards_printed, name='mark_cards_printed'),
     path('print-card/clear-session/', visitorapi_views.clear_print_session, name='clear_print_session'),
     path('print-card/delete/<int:visit_id>/', visitorapi_views.delete_unprinted_visit_request, name='delete_unprinted_visit_request'),
     path('visitors/<int:visitor_id>/upload-photo/', visitorapi_views.upload_visitor_photo, name='upload_visitor_photo'),
     path('checkout/', visitorapi_views.checkout_visitor, name='checkout_visitor'),
     path('checkin/', visitorapi_views.checkin_visitor, name='checkin_visitor'),
+    path('scans/batch/', visitorapi_views.scan_batch, name='scan_batch'),
+    path('card-cache/stats/', visitorapi_views.card_cache_stats, name='card_cache_stats'),
+    path('scans/duplicates/', visitorapi_views.scan_dedupe_stats, name='scan_dedupe_stats'),
+    path('metrics/', visitorapi_views.kiosk_metrics, name='kiosk_metrics'),
     path('checkout-page/', visitorapi_views.checkout_page, name='checkout_page'),
     path('checked-in-visitors/', visitorapi_views.checked_in_visitors, name='checked_in_visitors'),
     path('manual-checkout/', visitorapi_views.manual_checkout_visitor, name='manual_checkout_visitor'),
+    path('occupancy/', visitorapi_views.site_occupancy, name='site_occupancy'),
+    path('occupancy/hourly/', visitorapi_views.hourly_occupancy, name='hourly_occupancy'),
+    path('dashboard-events/', visitorapi_views.dashboard_events, name='dashboard_events'),
+    path('dashboard/requests/', visitorapi_views.dashboard_requests, name='dashboard_requests'),
     
     # Session-based auth and dashboard
     path('login/', visitorapi_views.login_view, name='login'),
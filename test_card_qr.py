@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Test for the on-demand card QR URLs.
+The digest in the URL is secret: the right one serves the image (private
+cache only), while a guessed or outdated one is a 404 that gives nothing away.
+"""
+import os
+import sys
+import django
+from datetime import date, time, timedelta
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.test import Client
+from visitorapi.models import HRUser, Visitor, VisitorCard, VisitRequest
+
+
+def test_card_qr_urls():
+    """Fetch a card's QR with its own, a guessed and an outdated digest"""
+    print("Testing card QR URLs")
+    print("=" * 50)
+
+    host, _ = HRUser.objects.get_or_create(
+        username='qrtesthost',
+        defaults={'user_type': 'HR', 'employee_id': 'QRT001', 'department': 'Test', 'phone': '0000000000'}
+    )
+    visitor, _ = Visitor.objects.get_or_create(
+        first_name='QR', last_name='Visitor', phone='0000000002', company='Test Company',
+        defaults={'id_proof_type': 'Passport', 'id_proof_number': 'QRT123'}
+    )
+    client = Client(HTTP_HOST='localhost')
+    checks = []
+    try:
+        visit = VisitRequest.objects.create(
+            visitor=visitor, host=host, purpose='QR URL test', visit_date=date.today(),
+            end_time=time(23, 59), status='APPROVED',
+        )
+        card = VisitorCard.objects.create(visit_request=visit, card_number='VC-QRTEST0001')
+        url = card.qr_image_url('png')
+
+        response = client.get(url)
+        checks.append(("Own digest serves the PNG", response.status_code == 200
+                       and response.content.startswith(b'\x89PNG')))
+        checks.append(("Only private caches may keep it", response['Cache-Control'].startswith('private')))
+
+        response = client.get(f'/cards/{card.card_number}/qr/guess.png')
+        checks.append(("Guessed digest is a 404 without a Location", response.status_code == 404
+                       and not response.has_header('Location')))
+
+        visit.valid_upto = date.today() + timedelta(days=3)
+        visit.save()
+        response = client.get(url)
+        checks.append(("Outdated digest is a 404 without a Location", response.status_code == 404
+                       and not response.has_header('Location')))
+    finally:
+        # Removes the visit request and card created above
+        VisitRequest.objects.filter(host=host, purpose='QR URL test').delete()
+
+    for label, ok in checks:
+        print(f"{label}: {'✓' if ok else '✗'}")
+    if not all(ok for _, ok in checks):
+        print("\n✗ Card QR URL checks failed")
+        return False
+    print("\n✓ Card QR URLs only serve the current digest")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_card_qr_urls() else 1)
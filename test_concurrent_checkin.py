@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Concurrency test for the kiosk check-in/check-out endpoints.
+Many threads scan the same card at once; exactly one check-in and one
+check-out must win (scans replayed by the duplicate-scan window don't count), and the attendance table and occupancy counter must agree.
+Best run against PostgreSQL (DATABASE_URL); SQLite serializes writers, so races are milder there.
+"""
+import os
+import sys
+import threading
+import django
+from datetime import date, time
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from visitorapi.models import HRUser, SiteOccupancy, Visitor, VisitAttendance, VisitorCard, VisitRequest
+
+THREADS = int(os.environ.get('CONCURRENCY_THREADS', '20'))
+ROUNDS = int(os.environ.get('CONCURRENCY_ROUNDS', '5'))
+
+
+def hammer(url, card_number):
+    """POST the same scan from THREADS threads released together; returns the JSON replies"""
+    barrier = threading.Barrier(THREADS)
+    results = []
+    lock = threading.Lock()
+
+    def scan():
+        client = Client(HTTP_HOST='localhost')
+        try:
+            barrier.wait()
+            reply = client.post(url, {'qr_data': f'{card_number}|test'}).json()
+        except Exception as e:
+            reply = {'success': False, 'error': f'exception: {e}'}
+        finally:
+            connection.close()
+        with lock:
+            results.append(reply)
+
+    threads = [threading.Thread(target=scan) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def occupancy_count(host_type):
+    row = SiteOccupancy.objects.filter(host_type=host_type).first()
+    return row.current_count if row else 0
+
+
+def test_concurrent_scans():
+    """Hammer one card with simultaneous check-ins, then simultaneous check-outs"""
+    print("Testing concurrent kiosk scans")
+    print("=" * 50)
+
+    host, _ = HRUser.objects.get_or_create(
+        username='concurrencyhost',
+        defaults={'user_type': 'HR', 'employee_id': 'CONC001', 'department': 'Test', 'phone': '0000000000'}
+    )
+    visitor, _ = Visitor.objects.get_or_create(
+        first_name='Concurrent', last_name='Visitor', phone='0000000001', company='Test Company',
+        defaults={'id_proof_type': 'Passport', 'id_proof_number': 'CONC123'}
+    )
+    failures = 0
+    try:
+        for round_no in range(1, ROUNDS + 1):
+            visit = VisitRequest.objects.create(
+                visitor=visitor, host=host, purpose='Concurrency test', visit_date=date.today(),
+                end_time=time(23, 59), status='APPROVED',
+            )
+            card = VisitorCard.objects.create(visit_request=visit, card_number=f'VC-CONC{round_no:04d}')
+            on_site_before = occupancy_count(host.user_type)
+
+            checkins = hammer('/checkin/', card.card_number)
+            won = [r for r in checkins if r.get('success') and not r.get('repeat_scan')]
+            errors = [r for r in checkins if 'exception' in r.get('error', '')]
+            sessions = VisitAttendance.objects.filter(visit_request=visit).count()
+            on_site = occupancy_count(host.user_type) - on_site_before
+            ok = len(won) == 1 and not errors and sessions == 1 and on_site == 1
+            failures += not ok
+            print(f"Round {round_no} check-in:  {len(won)} won, {THREADS - len(won)} refused, "
+                  f"{sessions} session(s), occupancy +{on_site} {'✓' if ok else '✗'}")
+            for r in errors:
+                print(f"  {r['error']}")
+
+            checkouts = hammer('/checkout/', card.card_number)
+            won = [r for r in checkouts if r.get('success') and not r.get('repeat_scan')]
+            errors = [r for r in checkouts if 'exception' in r.get('error', '')]
+            still_open = VisitAttendance.objects.open().filter(visit_request=visit).count()
+            on_site = occupancy_count(host.user_type) - on_site_before
+            ok = len(won) == 1 and not errors and still_open == 0 and on_site == 0
+            failures += not ok
+            print(f"Round {round_no} check-out: {len(won)} won, {THREADS - len(won)} refused, "
+                  f"{still_open} open, occupancy +{on_site} {'✓' if ok else '✗'}")
+            for r in errors:
+                print(f"  {r['error']}")
+    finally:
+        # Removes the visit requests, cards and attendance rows created above
+        VisitRequest.objects.filter(host=host, purpose='Concurrency test').delete()
+
+    if failures:
+        print(f"\n✗ {failures} check(s) failed")
+        return False
+    print("\n✓ Every scan race had exactly one winner")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_concurrent_scans() else 1)
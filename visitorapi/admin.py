@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import HRUser, Visitor, VisitRequest, VisitorCard
+from . import card_printing
+from .models import LEGACY_DAY_COLUMNS, ExportJob, HRUser, Visitor, VisitRequest, VisitorCard, VisitAttendance, SiteOccupancy, VisitorStats
 
 @admin.register(HRUser)
 class HRUserAdmin(UserAdmin):
@@ -33,12 +34,22 @@ class VisitorAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-created_at',)
 
+class VisitAttendanceInline(admin.TabularInline):
+    model = VisitAttendance
+    extra = 0
+    fields = ('day_number', 'checkin_time', 'checkout_time', 'checkout_by_hr')
+
 @admin.register(VisitRequest)
 class VisitRequestAdmin(admin.ModelAdmin):
+    inlines = [VisitAttendanceInline]
     list_display = ('visitor', 'host', 'purpose', 'visit_date', 'status', 'checkin_time', 'checkout_time')
-    list_filter = ('status', 'visit_date', 'host__user_type', 'allow_mobile', 'allow_laptop')
+    list_filter = ('status', 'visit_date', 'host_role', 'allow_mobile', 'allow_laptop')
     search_fields = ('visitor__first_name', 'visitor__last_name', 'host__username', 'purpose')
-    readonly_fields = ('created_at', 'updated_at')
+    # The day columns mirror the attendance sessions below; edit those instead
+    day_fields = tuple(
+        f'day_{day}_{kind}' for day in range(1, LEGACY_DAY_COLUMNS + 1) for kind in ('checkin', 'checkout')
+    )
+    readonly_fields = ('created_at', 'updated_at') + day_fields
     ordering = ('-created_at',)
     
     fieldsets = (
@@ -54,6 +65,10 @@ class VisitRequestAdmin(admin.ModelAdmin):
         ('Check-in/Check-out', {
             'fields': ('checkin_time', 'checkout_time', 'checkout_by_hr')
         }),
+        ('Day Columns', {
+            'fields': day_fields,
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
             'fields': ('created_by', 'created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -62,8 +77,32 @@ class VisitRequestAdmin(admin.ModelAdmin):
 
 @admin.register(VisitorCard)
 class VisitorCardAdmin(admin.ModelAdmin):
-    list_display = ('card_number', 'visit_request', 'status', 'issued_at', 'returned_at', 'printed')
-    list_filter = ('status', 'printed', 'issued_at', 'returned_at')
+    list_display = ('card_number', 'visit_request', 'status', 'issued_at', 'returned_at', 'printed', 'qr_status')
+    list_filter = ('status', 'printed', 'qr_status', 'issued_at', 'returned_at')
     search_fields = ('card_number', 'visit_request__visitor__first_name', 'visit_request__visitor__last_name')
-    readonly_fields = ('issued_at', 'qr_code_image')
-    ordering = ('-issued_at',) 
\ No newline at end of file
+    readonly_fields = ('issued_at', 'qr_code_image', 'qr_status')
+    ordering = ('-issued_at',)
+    actions = ['mark_printed']
+
+    @admin.action(description='Mark selected cards printed (checks visitors in for day 1)')
+    def mark_printed(self, request, queryset):
+        printed, checked_in = card_printing.mark_printed(queryset.values_list('id', flat=True))
+        self.message_user(request, f'{printed} card(s) marked printed, {checked_in} visitor(s) checked in.')
+
+@admin.register(SiteOccupancy)
+class SiteOccupancyAdmin(admin.ModelAdmin):
+    list_display = ('host_type', 'current_count', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+@admin.register(VisitorStats)
+class VisitorStatsAdmin(admin.ModelAdmin):
+    list_display = ('visitor', 'host_type', 'visit_count', 'recent_count', 'last_visit')
+    list_filter = ('host_type',)
+    search_fields = ('visitor__first_name', 'visitor__last_name', 'visitor__phone')
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'requested_by', 'format', 'host_role', 'status', 'rows_done', 'total_rows', 'created_at', 'expires_at')
+    list_filter = ('status', 'format', 'host_role')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
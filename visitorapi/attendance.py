@@ -0,0 +1,75 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import dashboard, events, occupancy
+from .models import LEGACY_DAY_COLUMNS, VisitAttendance, VisitRequest
+
+# A check-out is accepted this many days past the visit's last day (scans after midnight)
+CHECKOUT_GRACE_DAYS = 1
+
+
+def _mirror_legacy_column(visit_request_id, day_number, kind, value):
+    """Keep the old day_N_checkin/day_N_checkout columns in step for days 1-10"""
+    if not (1 <= day_number <= LEGACY_DAY_COLUMNS):
+        return
+    field = f'day_{day_number}_{kind}'
+    VisitRequest.objects.filter(id=visit_request_id, **{f'{field}__isnull': True}).update(**{field: value})
+
+
+def _claim_checkin(visit_request, day_number, when):
+    """
+    Decide a check-in with one conditional UPDATE on the day's legacy column:
+    the scanner whose UPDATE touches the row wins, every concurrent one sees 0.
+    Days past the legacy columns fall back to the attendance unique constraint.
+    """
+    if 1 <= day_number <= LEGACY_DAY_COLUMNS:
+        field = f'day_{day_number}_checkin'
+        if not VisitRequest.objects.filter(id=visit_request.id, **{f'{field}__isnull': True}).update(**{field: when}):
+            return None
+        return VisitAttendance.objects.create(visit_request=visit_request, day_number=day_number, checkin_time=when)
+    try:
+        with transaction.atomic():
+            return VisitAttendance.objects.create(visit_request=visit_request, day_number=day_number, checkin_time=when)
+    except IntegrityError:
+        return None
+
+
+def check_in(visit_request, day_number, when=None, enforce_capacity=False):
+    """
+    Open the attendance session for the given day.
+    Returns the new VisitAttendance, or None if that day is already checked in.
+    Raises occupancy.SiteAtCapacity if enforce_capacity is set and the site is full.
+    """
+    when = when or timezone.now()
+    with transaction.atomic():
+        attendance = _claim_checkin(visit_request, day_number, when)
+        if attendance is None:
+            return None
+        occupancy.admit(visit_request.host_role, enforce_capacity=enforce_capacity)
+        events.publish_checkin(visit_request, attendance)
+    return attendance
+
+
+def check_out(visit_request, day_number=None, when=None, by_hr=False):
+    """
+    Close an open attendance session with a single conditional UPDATE. With no
+    day_number, the earliest open session is closed. Returns the checkout
+    time, or None if there was no open session (or another scanner closed it first).
+    """
+    when = when or timezone.now()
+    open_sessions = VisitAttendance.objects.open().filter(visit_request=visit_request)
+    with transaction.atomic():
+        if day_number is None:
+            day_number = open_sessions.order_by('day_number').values_list('day_number', flat=True).first()
+            if day_number is None:
+                return None
+        if not open_sessions.filter(day_number=day_number).update(checkout_time=when, checkout_by_hr=by_hr):
+            return None
+        _mirror_legacy_column(visit_request.id, day_number, 'checkout', when)
+        occupancy.release(visit_request.host_role)
+        events.publish_checkout(visit_request, day_number, when)
+        if by_hr:
+            VisitRequest.objects.filter(id=visit_request.id).update(checkout_by_hr=True)
+        # update() sends no post_save, so invalidate the cached checked-in lists here
+        dashboard.bump_version()
+    return when
@@ -0,0 +1,153 @@
+"""
+In-process LRU + TTL cache of the card lookup done on every kiosk scan.
+
+Entries are dropped when the card or its visit request is saved or deleted
+in this process (see signals), and all of them when a host's user type
+changes (HRUser.save). Other worker processes only notice after
+CARD_CACHE_SECONDS, which bounds how stale a gate decision can be.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import Visitor, VisitorCard, VisitRequest
+
+DEFAULT_SIZE = 1024
+DEFAULT_SECONDS = 60
+
+
+class CardEntry(namedtuple('CardEntry', [
+    'visit_id', 'visit_date', 'valid_upto', 'end_time', 'visitor_name',
+    'host_role', 'purpose', 'visitor_id', 'visitor_first_name', 'visitor_last_name',
+    'visitor_email', 'visitor_company',
+])):
+    """What a scan needs to know about a card, without touching the database"""
+
+    @classmethod
+    def from_card(cls, card):
+        visit_request = card.visit_request
+        visitor = visit_request.visitor
+        return cls(
+            visit_id=visit_request.id,
+            visit_date=visit_request.visit_date,
+            valid_upto=visit_request.valid_upto,
+            end_time=visit_request.end_time,
+            visitor_name=f"{visitor.first_name} {visitor.last_name}",
+            host_role=visit_request.host_role,
+            purpose=visit_request.purpose,
+            visitor_id=visitor.id,
+            visitor_first_name=visitor.first_name,
+            visitor_last_name=visitor.last_name,
+            visitor_email=visitor.email,
+            visitor_company=visitor.company,
+        )
+
+    def visit_request(self):
+        """
+        An unsaved VisitRequest carrying the cached fields, enough for the day
+        number checks, attendance and dashboard events. Never save() it.
+        """
+        visitor = Visitor(
+            id=self.visitor_id, first_name=self.visitor_first_name, last_name=self.visitor_last_name,
+            email=self.visitor_email, company=self.visitor_company,
+        )
+        return VisitRequest(
+            id=self.visit_id, visitor=visitor, visit_date=self.visit_date, valid_upto=self.valid_upto,
+            end_time=self.end_time, host_role=self.host_role, purpose=self.purpose,
+        )
+
+
+class CardCache:
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # card_number -> (expires_at, CardEntry)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        # Bumped by every invalidation so a lookup that raced one does not store stale data
+        self.generation = 0
+
+    def get(self, card_number):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(card_number)
+            if item is not None and item[0] > now:
+                self._entries.move_to_end(card_number)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._entries[card_number]
+            self.misses += 1
+        return None
+
+    def put(self, card_number, entry, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[card_number] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(card_number)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_visit(self, visit_id):
+        """Drop every card of a visit request (its card number may have changed)"""
+        with self._lock:
+            self.generation += 1
+            stale = [number for number, (_, entry) in self._entries.items() if entry.visit_id == visit_id]
+            for number in stale:
+                del self._entries[number]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+_cache = CardCache(
+    getattr(settings, 'CARD_CACHE_SIZE', DEFAULT_SIZE),
+    getattr(settings, 'CARD_CACHE_SECONDS', DEFAULT_SECONDS),
+)
+
+
+def lookup(card_number):
+    """CardEntry for a card number, or None if there is no such card"""
+    entry = _cache.get(card_number)
+    if entry is not None:
+        return entry
+    generation = _cache.generation
+    card = VisitorCard.objects.select_related('visit_request__visitor').filter(card_number=card_number).first()
+    if card is None:
+        return None
+    entry = CardEntry.from_card(card)
+    _cache.put(card_number, entry, generation)
+    return entry
+
+
+def invalidate_visit(visit_id):
+    _cache.invalidate_visit(visit_id)
+
+
+def clear():
+    _cache.clear()
+
+
+def stats():
+    return _cache.stats()
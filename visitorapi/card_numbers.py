@@ -0,0 +1,76 @@
+"""
+Card number allocation.
+
+Numbers come from a database counter, reserved in blocks so issuing a batch
+of cards costs one UPDATE. They are VC- followed by an 8-digit sequence and a
+Luhn check digit (9 digits), so they can never collide with the random
+8-digit numbers issued before, and a mistyped number is caught.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import CardNumberCounter
+
+PREFIX = 'VC-'
+COUNTER = 'visitor_card'
+# Numbers reserved per trip to the database; unused ones are skipped on restart
+BLOCK_SIZE = 50
+
+_lock = threading.Lock()
+_block = iter(())
+
+
+def check_digit(digits):
+    """Luhn check digit for a string of digits"""
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        n = int(digit)
+        if i % 2 == 0:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return str((10 - total % 10) % 10)
+
+
+def format_number(sequence):
+    body = f'{sequence:08d}'
+    return f'{PREFIX}{body}{check_digit(body)}'
+
+
+def is_valid(card_number):
+    """True for an allocated-format number whose check digit matches"""
+    digits = card_number[len(PREFIX):]
+    return (
+        card_number.startswith(PREFIX) and len(digits) >= 9 and digits.isdigit()
+        and check_digit(digits[:-1]) == digits[-1]
+    )
+
+
+def _reserve(count):
+    """Reserve count sequence numbers; the UPDATE comes first so concurrent reservers queue on the row"""
+    with transaction.atomic():
+        CardNumberCounter.objects.get_or_create(name=COUNTER)
+        CardNumberCounter.objects.filter(name=COUNTER).update(next_value=F('next_value') + count)
+        end = CardNumberCounter.objects.get(name=COUNTER).next_value
+    return range(end - count, end)
+
+
+def allocate(count):
+    """count fresh card numbers, unique across processes"""
+    global _block
+    numbers = []
+    with _lock:
+        numbers.extend(format_number(n) for _, n in zip(range(count), _block))
+        missing = count - len(numbers)
+        if missing:
+            # Inside a caller's transaction a rollback would hand the block out again,
+            # so reserve only what is needed and keep nothing for later
+            if transaction.get_connection().in_atomic_block:
+                numbers.extend(format_number(n) for n in _reserve(missing))
+            else:
+                _block = iter(_reserve(max(BLOCK_SIZE, missing)))
+                numbers.extend(format_number(n) for _, n in zip(range(missing), _block))
+    return numbers
@@ -0,0 +1,233 @@
+"""
+Server-side PDF of visitor cards, COLUMNS x ROWS cards per A4 sheet.
+
+Each sheet is drawn with Pillow onto a copy of a cached blank card (border,
+logo, titles and labels are drawn once per process), encoded as JPEG and
+written as one PDF page. Pages are streamed as they are finished; large
+batches are drawn in a process pool. Only picklable data (strings and photo
+bytes) crosses into the pool.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from .qr_payload import for_card
+from .qr_render import render_image
+
+DPI = 200
+COLUMNS, ROWS = 2, 4
+CARDS_PER_SHEET = COLUMNS * ROWS
+# Sizes in cm
+PAGE_W, PAGE_H = 21.0, 29.7
+CARD_W, CARD_H = 9.5, 6.6
+LOGO = 'img/godrej_logo.png'
+TITLE = ('Safety Passport', 'Godrej Industries Ltd, Valia')
+LABELS = ('VC:', 'NM:', 'ORG:', 'Issued:', 'Valid:')
+CHECKOUT_NOTE = 'Please check out before '
+JPEG_QUALITY = 92
+# PDF user space is in points
+PAGE_POINTS = (595.28, 841.89)
+
+_pool = None
+_pool_workers = 1
+
+
+def _px(cm):
+    return round(cm / 2.54 * DPI)
+
+
+@lru_cache(maxsize=None)
+def _font(size_cm):
+    return ImageFont.load_default(size=_px(size_cm))
+
+
+def _fit(draw, text, font, width):
+    """text, cut with an ellipsis to fit width pixels"""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+@lru_cache(maxsize=4)
+def _blank_card(logo_path):
+    """Everything on a card that does not depend on the visitor, drawn once per process"""
+    card = Image.new('RGB', (_px(CARD_W), _px(CARD_H)), 'white')
+    draw = ImageDraw.Draw(card)
+    draw.rectangle([0, 0, card.width - 1, card.height - 1], outline=(160, 160, 160), width=2)
+    if logo_path:
+        with Image.open(logo_path) as logo:
+            logo = logo.convert('RGBA')
+            logo.thumbnail((_px(2.0), _px(0.9)))
+            card.paste(logo, (_px(0.3), _px(0.3)), logo)
+    draw.text((_px(2.6), _px(0.3)), TITLE[0], fill='black', font=_font(0.42))
+    draw.text((_px(2.6), _px(0.8)), TITLE[1], fill='black', font=_font(0.32))
+    draw.rectangle([_px(0.3), _px(1.4), _px(2.5), _px(4.2)], outline='black', width=2)  # photo
+    for i, label in enumerate(LABELS):
+        draw.text((_px(2.8), _px(1.45 + 0.55 * i)), label, fill='black', font=_font(0.28))
+    draw.text((_px(0.3), _px(4.65)), CHECKOUT_NOTE, fill='black', font=_font(0.3))
+    for x in (0.3, 5.0):
+        draw.line([_px(x), _px(6.0), _px(x + 4.2), _px(6.0)], fill='black', width=2)
+    draw.text((_px(0.3), _px(6.05)), 'Security Sign', fill='black', font=_font(0.24))
+    draw.text((_px(5.0), _px(6.05)), 'Visitor Sign', fill='black', font=_font(0.24))
+    return card
+
+
+def _draw_card(data, logo_path):
+    card = _blank_card(logo_path).copy()
+    draw = ImageDraw.Draw(card)
+    label_font = _font(0.28)
+    value_x = _px(2.8) + max(round(label_font.getlength(label)) for label in LABELS) + _px(0.15)
+    value_w = _px(6.8) - value_x
+    values = (data['card_number'], data['name'], data['company'], data['issued'], data['valid_upto'])
+    for i, value in enumerate(values):
+        draw.text((value_x, _px(1.45 + 0.55 * i)), _fit(draw, value, label_font, value_w), fill='black', font=label_font)
+    note_x = _px(0.3) + round(_font(0.3).getlength(CHECKOUT_NOTE))
+    draw.text((note_x, _px(4.65)), data['checkout_before'], fill='black', font=_font(0.3))
+    if data['photo']:
+        try:
+            with Image.open(BytesIO(data['photo'])) as photo:
+                photo = ImageOps.fit(photo.convert('RGB'), (_px(2.2) - 4, _px(2.8) - 4))
+                card.paste(photo, (_px(0.3) + 2, _px(1.4) + 2))
+        except OSError:
+            pass  # unreadable photo: leave the box empty
+    qr = render_image(data['qr_data'], box_size=1)
+    scale = max(1, _px(2.3) // qr.width)  # whole pixels per module keep the edges exact
+    qr = qr.resize((qr.width * scale, qr.height * scale), Image.NEAREST).convert('RGB')
+    card.paste(qr, (_px(CARD_W - 0.2) - qr.width, _px(1.4)))
+    return card
+
+
+def render_sheet(cards, logo_path):
+    """One A4 page holding up to CARDS_PER_SHEET cards; returns (jpeg bytes, width, height)"""
+    page = Image.new('RGB', (_px(PAGE_W), _px(PAGE_H)), 'white')
+    margin_x = (_px(PAGE_W) - COLUMNS * _px(CARD_W)) // (COLUMNS + 1)
+    margin_y = (_px(PAGE_H) - ROWS * _px(CARD_H)) // (ROWS + 1)
+    for i, data in enumerate(cards):
+        row, column = divmod(i, COLUMNS)
+        x = margin_x + column * (_px(CARD_W) + margin_x)
+        y = margin_y + row * (_px(CARD_H) + margin_y)
+        page.paste(_draw_card(data, logo_path), (x, y))
+    buffer = BytesIO()
+    # No chroma subsampling, so QR module edges stay sharp
+    page.save(buffer, format='JPEG', quality=JPEG_QUALITY, subsampling=0, dpi=(DPI, DPI))
+    return buffer.getvalue(), page.width, page.height
+
+
+def _photo_bytes(visitor):
+    if not visitor.photo:
+        return None
+    try:
+        with visitor.photo.open('rb') as f:
+            return f.read()
+    except (OSError, ValueError):
+        return None
+
+
+def card_data(card):
+    """Plain, picklable fields of one card"""
+    visit_request = card.visit_request
+    visitor = visit_request.visitor
+    return {
+        'card_number': card.card_number,
+        'name': f"{visitor.first_name} {visitor.last_name}",
+        'company': visitor.company or '',
+        'issued': card.issued_at.strftime('%d/%m/%Y') if card.issued_at else '',
+        'valid_upto': (visit_request.valid_upto or visit_request.visit_date).strftime('%d/%m/%Y'),
+        'checkout_before': visit_request.end_time.strftime('%H:%M') if visit_request.end_time else '',
+        'qr_data': for_card(card),
+        'photo': _photo_bytes(visitor),
+    }
+
+
+def _get_pool():
+    global _pool, _pool_workers
+    if _pool is None:
+        _pool_workers = getattr(settings, 'CARD_PDF_PROCESSES', None) or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+    return _pool
+
+
+def _sheets(cards):
+    batch = []
+    for card in cards:
+        batch.append(card_data(card))
+        if len(batch) == CARDS_PER_SHEET:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _pages(cards, count):
+    """Rendered pages in order; big batches go to the process pool, a few sheets at a time"""
+    logo_path = finders.find(LOGO)
+    if count < getattr(settings, 'CARD_PDF_POOL_MIN_CARDS', 40):
+        for sheet in _sheets(cards):
+            yield render_sheet(sheet, logo_path)
+        return
+    pool = _get_pool()
+    in_flight = deque()
+    for sheet in _sheets(cards):
+        in_flight.append(pool.submit(render_sheet, sheet, logo_path))
+        if len(in_flight) > _pool_workers * 2:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def stream(cards, count):
+    """
+    PDF bytes, chunk by chunk, for the given VisitorCards (visit_request and
+    visitor selected). Objects: 1 catalog, 2 page tree, then image, content
+    and page per sheet; the page tree and xref go last once the pages are known.
+    """
+    offsets = {}
+    position = 0
+
+    def emit(number, body, stream_bytes=None):
+        nonlocal position
+        offsets[number] = position
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream_bytes is not None:
+            chunk += b'\nstream\n' + stream_bytes + b'\nendstream'
+        chunk += b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header + emit(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    width_pt, height_pt = PAGE_POINTS
+    page_numbers = []
+    number = 3
+    for jpeg, width, height in _pages(cards, count):
+        image, content, page = number, number + 1, number + 2
+        number += 3
+        page_numbers.append(page)
+        draw = f'q {width_pt} 0 0 {height_pt} 0 0 cm /Im0 Do Q'.encode()
+        yield (
+            emit(image, (
+                f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB '
+                f'/BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>'
+            ).encode(), jpeg)
+            + emit(content, f'<< /Length {len(draw)} >>'.encode(), draw)
+            + emit(page, (
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt} {height_pt}] '
+                f'/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R >>'
+            ).encode())
+        )
+    kids = ' '.join(f'{page} 0 R' for page in page_numbers)
+    tail = emit(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>'.encode())
+    xref_at = position
+    xref = [f'xref\n0 {number}\n', '0000000000 65535 f \n']
+    xref += [f'{offsets[n]:010d} 00000 n \n' for n in range(1, number)]
+    xref.append(f'trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n')
+    yield tail + ''.join(xref).encode()
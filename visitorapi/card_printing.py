@@ -0,0 +1,50 @@
+"""
+Marking visitor cards printed.
+
+Printing a card checks its visitor in for day 1 unless they already are.
+The whole batch is one transaction with a fixed number of statements: one
+UPDATE for the cards, one for the visits' day_1_checkin (COALESCE keeps a
+check-in that is already there), one INSERT for the attendance sessions and
+one per host type for the occupancy counters. Dashboard check-in events
+follow in a single INSERT after commit.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import dashboard, events, occupancy
+from .models import VisitAttendance, VisitorCard, VisitRequest
+
+
+def mark_printed(card_ids, when=None):
+    """
+    Flag the given cards printed and check their visits in for day 1 if they
+    are not checked in yet. Returns (cards updated, visits checked in).
+    """
+    when = when or timezone.now()
+    card_ids = list(card_ids)
+    with transaction.atomic():
+        printed = VisitorCard.objects.filter(id__in=card_ids).update(printed=True)
+        visit_ids = VisitorCard.objects.filter(id__in=card_ids).values('visit_request_id')
+        # Lock the visits about to be stamped so a gate scan cannot check them in meanwhile
+        newly_in = list(
+            VisitRequest.objects.select_for_update(of=('self',)).select_related('visitor')
+            .filter(id__in=visit_ids, day_1_checkin__isnull=True)
+        )
+        if not newly_in:
+            return printed, 0
+        VisitRequest.objects.filter(id__in=[visit.id for visit in newly_in]).update(
+            day_1_checkin=Coalesce(F('day_1_checkin'), Value(when)),
+        )
+        sessions = VisitAttendance.objects.bulk_create([
+            VisitAttendance(visit_request=visit, day_number=1, checkin_time=when) for visit in newly_in
+        ])
+        for host_type, count in Counter(visit.host_role for visit in newly_in).items():
+            occupancy.admit(host_type, count=count)
+        events.publish_checkins(zip(newly_in, sessions))
+        # update() and bulk_create() send no signals, so invalidate the dashboards here
+        dashboard.bump_version()
+    return printed, len(newly_in)
@@ -0,0 +1,164 @@
+import base64
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import stats
+from .models import VisitRequest
+
+# Dashboard tabs and the visit status each one lists ('all' lists every status)
+TABS = {
+    'pending': 'PENDING',
+    'approved': 'APPROVED',
+    'rejected': 'REJECTED',
+    'all': None,
+}
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+RECENT_DAYS = 7
+
+VERSION_KEY = 'dashboard:version'
+# How long a rebuild may hold the lock (and others wait for it) before they give up and build too
+REBUILD_LOCK_SECONDS = 10
+
+
+def encode_cursor(visit_request):
+    raw = f"{visit_request.created_at.isoformat()}|{visit_request.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id); raises ValueError for a malformed cursor"""
+    try:
+        created_at, visit_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(visit_id)
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def request_row(visit_request):
+    """Fields shown in the pending/approved/rejected tables"""
+    visitor = visit_request.visitor
+    return {
+        'visit_id': visit_request.id,
+        'visitor_id': visitor.id,
+        'name': f"{visitor.first_name} {visitor.last_name}",
+        'email': visitor.email or '',
+        'company': visitor.company,
+        'purpose': visit_request.purpose,
+        'status': visit_request.status,
+        'start_time': visit_request.start_time.strftime('%H:%M') if visit_request.start_time else '',
+        'visit_date': visit_request.visit_date.strftime('%B %d, %Y') if visit_request.visit_date else '',
+        'end_time': visit_request.end_time.strftime('%H:%M') if visit_request.end_time else '',
+        'valid_upto': visit_request.valid_upto.strftime('%B %d, %Y') if visit_request.valid_upto else '',
+        'reference_employee_name': visit_request.reference_employee_name or '',
+        'allow_mobile': visit_request.allow_mobile,
+        'allow_laptop': visit_request.allow_laptop,
+    }
+
+
+def visit_detail_row(visit_request):
+    """Fields shown in the All Visitor Details modal"""
+    visitor = visit_request.visitor
+    created_by = visit_request.created_by
+    row = request_row(visit_request)
+    row.update({
+        'first_name': visitor.first_name,
+        'last_name': visitor.last_name,
+        'phone': visitor.phone,
+        'id_proof_type': visitor.id_proof_type,
+        'id_proof_number': visitor.id_proof_number,
+        'other_purpose': visit_request.other_purpose or '',
+        'photo_url': visitor.photo.url if visitor.photo else '',
+        'reference_employee_department': visit_request.reference_employee_department or '',
+        'reference_purpose': visit_request.reference_purpose or '',
+        'created_by': (created_by.get_full_name() or created_by.username) if created_by else '',
+    })
+    return row
+
+
+def tab_page(host_type, tab, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One keyset-paginated page of a dashboard tab, newest first.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    status = TABS[tab]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    since = timezone.now() - timedelta(days=RECENT_DAYS)
+    queryset = VisitRequest.objects.filter(host_role=host_type, created_at__gte=since)
+    if status:
+        queryset = queryset.filter(status=status)
+    if cursor:
+        created_at, visit_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=visit_id))
+    related = ['visitor', 'created_by'] if tab == 'all' else ['visitor']
+    page = list(queryset.select_related(*related).order_by('-created_at', '-id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    build = visit_detail_row if tab == 'all' else request_row
+    return [build(vr) for vr in page[:limit]], next_cursor
+
+
+def data_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost version never reuses an old number
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_version():
+    """Invalidate every cached dashboard once the current transaction commits"""
+    transaction.on_commit(_bump)
+
+
+def cached(role, name, build):
+    """
+    Return build() cached under (role, name, data version). On a miss only one
+    caller rebuilds; concurrent callers wait for its result instead of
+    repeating the queries.
+    """
+    key = f'dashboard:{role}:{name}:{data_version()}'
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=REBUILD_LOCK_SECONDS):
+        try:
+            value = build()
+            cache.set(key, value, getattr(settings, 'DASHBOARD_CACHE_SECONDS', 30))
+        finally:
+            cache.delete(lock_key)
+        return value
+    deadline = time.monotonic() + REBUILD_LOCK_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
+
+
+def build_context(role):
+    """Dashboard context shared by every HR or HOS user"""
+    return {
+        # Frequent users: visit count and last visit date (last 7 days only), read from VisitorStats
+        'frequent_visitors': stats.top_visitors(role, recent=True),
+        # Checked-in visitors for any day (multi-day aware, no 7-day filter)
+        'checked_in_visitors': [
+            {'visit': vr, 'day_num': vr.day_num, 'checkin_time': vr.checkin_at}
+            for vr in VisitRequest.objects.filter(host_role=role).currently_checked_in()
+        ],
+    }
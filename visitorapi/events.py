@@ -0,0 +1,113 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.timezone import localtime
+
+from .dashboard import request_row
+from .models import DashboardEvent
+
+# Prune old events once every this many publishes
+PRUNE_EVERY = 200
+KEEPALIVE_SECONDS = 15
+
+
+def _prune(event_ids):
+    if not any(event_id % PRUNE_EVERY == 0 for event_id in event_ids if event_id):
+        return
+    cutoff = timezone.now() - timedelta(minutes=getattr(settings, 'DASHBOARD_EVENT_RETENTION_MINUTES', 60))
+    DashboardEvent.objects.filter(created_at__lt=cutoff).delete()
+
+
+def publish(event_type, host_type, **payload):
+    """Queue an event for the dashboards of host_type once the current transaction commits"""
+    def _create():
+        event = DashboardEvent.objects.create(event_type=event_type, host_type=host_type, payload=payload)
+        _prune([event.id])
+    transaction.on_commit(_create)
+
+
+def visit_summary(visit_request):
+    """Fields the dashboard rows show for a visit"""
+    visitor = visit_request.visitor
+    return {
+        'visit_id': visit_request.id,
+        'visitor_id': visitor.id,
+        'name': f"{visitor.first_name} {visitor.last_name}",
+        'email': visitor.email or '',
+        'company': visitor.company,
+        'purpose': visit_request.purpose,
+    }
+
+
+def _checkin_payload(visit_request, session):
+    return dict(
+        day_num=session.day_number,
+        checkin_time=localtime(session.checkin_time).strftime('%Y-%m-%d %H:%M:%S'),
+        **visit_summary(visit_request),
+    )
+
+
+def publish_checkin(visit_request, session):
+    publish('checkin', visit_request.host_role, **_checkin_payload(visit_request, session))
+
+
+def publish_checkins(visits_and_sessions):
+    """Check-in events for many (visit request, session) pairs, written in one INSERT on commit"""
+    pending = [
+        DashboardEvent(event_type='checkin', host_type=visit_request.host_role, payload=_checkin_payload(visit_request, session))
+        for visit_request, session in visits_and_sessions
+    ]
+
+    def _create():
+        _prune([event.id for event in DashboardEvent.objects.bulk_create(pending)])
+    if pending:
+        transaction.on_commit(_create)
+
+
+def publish_checkout(visit_request, day_number, checkout_time):
+    publish(
+        'checkout', visit_request.host_role,
+        visit_id=visit_request.id,
+        day_num=day_number,
+        checkout_time=localtime(checkout_time).strftime('%Y-%m-%d %H:%M:%S'),
+    )
+
+
+def publish_request(event_type, visit_request):
+    """Registration of a new request or an approve/reject decision"""
+    publish(event_type, visit_request.host_role, **request_row(visit_request))
+
+
+def _format(event):
+    return f"id: {event.id}\nevent: {event.event_type}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+async def stream(host_type, last_id):
+    """
+    Server-sent event stream for one dashboard. Polls the indexed event table
+    and ends after DASHBOARD_EVENT_STREAM_SECONDS; EventSource reconnects with
+    Last-Event-ID so nothing is missed.
+    """
+    poll = getattr(settings, 'DASHBOARD_EVENT_POLL_SECONDS', 2)
+    deadline = timezone.now() + timedelta(seconds=getattr(settings, 'DASHBOARD_EVENT_STREAM_SECONDS', 300))
+    if last_id is None:
+        latest = await DashboardEvent.objects.filter(host_type=host_type).order_by('-id').afirst()
+        last_id = latest.id if latest else 0
+    yield f"retry: {poll * 1000}\n\n"
+    idle = 0
+    while timezone.now() < deadline:
+        found = False
+        async for event in DashboardEvent.objects.filter(host_type=host_type, id__gt=last_id).order_by('id')[:100]:
+            found = True
+            last_id = event.id
+            yield _format(event)
+        idle = 0 if found else idle + poll
+        if idle >= KEEPALIVE_SECONDS:
+            # Comment line so proxies don't drop an idle connection
+            yield ": keep-alive\n\n"
+            idle = 0
+        await asyncio.sleep(poll)
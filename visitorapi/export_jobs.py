@@ -0,0 +1,147 @@
+"""
+Visit exports built in the background.
+
+A request only queues an ExportJob. The run_export_jobs worker claims the
+oldest pending job with a conditional UPDATE, writes the export to a
+temporary file while recording how many rows are done, and stores the file
+in media storage until EXPORT_JOB_EXPIRY_HOURS have passed. Without a worker
+(EXPORT_JOB_WORKER off) the web process runs the job in a thread once the
+request has committed. A running job records a heartbeat as it goes; one
+silent for EXPORT_JOB_STALE_MINUTES lost its worker (or thread) and is marked
+failed. cleanup_export_jobs deletes expired files and jobs.
+"""
+import logging
+import secrets
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import exports
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Sheet title and download file name per exported host role ('' is every host)
+TITLES = {'': ('Visitors', 'visitors'), 'HOS': ('HOS Visitors', 'hos_visitors')}
+
+
+def enqueue(user, fmt, host_role=''):
+    """Queue an export of the visits of host_role (all if blank) in fmt"""
+    job = ExportJob.objects.create(requested_by=user, format=fmt, host_role=host_role)
+    if not getattr(settings, 'EXPORT_JOB_WORKER', False):
+        transaction.on_commit(lambda: threading.Thread(target=_run_in_thread, args=(job.id,), daemon=True).start())
+    return job
+
+
+def _run_in_thread(job_id):
+    try:
+        job = claim(job_id)
+        if job is not None:
+            run(job)
+    finally:
+        connection.close()
+
+
+def claim(job_id=None):
+    """
+    Mark a pending job running and return it: job_id if given, otherwise the
+    oldest. Only the caller whose UPDATE changes the row gets it. None if
+    there is nothing to claim.
+    """
+    pending = ExportJob.objects.filter(status=ExportJob.PENDING)
+    candidates = [job_id] if job_id else pending.order_by('id').values_list('id', flat=True)[:10]
+    for candidate in candidates:
+        now = timezone.now()
+        if pending.filter(id=candidate).update(status=ExportJob.RUNNING, started_at=now, heartbeat_at=now):
+            return ExportJob.objects.get(id=candidate)
+    return None
+
+
+def _counted(rows, job):
+    """rows, saving how many have been written every CHUNK_SIZE rows"""
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % exports.CHUNK_SIZE == 0:
+            _beat(job, rows_done=done)
+    job.rows_done = done
+
+
+def _beat(job, **fields):
+    ExportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now(), **fields)
+
+
+def run(job):
+    """Build the export of a claimed job and store it. Returns True if it is ready."""
+    queryset = exports.visit_queryset(job.host_role or None)
+    title, basename = TITLES.get(job.host_role, TITLES[''])
+    _, extension = exports.FORMATS[job.format]
+    try:
+        _beat(job, total_rows=queryset.count())
+        with tempfile.TemporaryFile() as file:
+            exports.write(job.format, file, _counted(exports.typed_rows(exports.fetch(queryset)), job), title)
+            file.seek(0)
+            _beat(job)
+            # Media URLs can be public; the random part keeps the file name unguessable
+            job.file.save(f'{basename}-{job.id}-{secrets.token_hex(8)}.{extension}', File(file), save=False)
+    except Exception as e:
+        logger.exception('Export job %s failed', job.id)
+        ExportJob.objects.filter(id=job.id).update(status=ExportJob.FAILED, error=str(e), finished_at=timezone.now())
+        return False
+    finished = timezone.now()
+    ready = ExportJob.objects.filter(id=job.id, status=ExportJob.RUNNING).update(
+        status=ExportJob.READY, file=job.file.name, rows_done=job.rows_done, finished_at=finished,
+        expires_at=finished + timedelta(hours=getattr(settings, 'EXPORT_JOB_EXPIRY_HOURS', 24)),
+    )
+    if not ready:
+        # Given up on as stale meanwhile; nothing will serve or clean up this file
+        job.file.delete(save=False)
+    return bool(ready)
+
+
+def fail_stale(now=None):
+    """Mark running jobs failed whose heartbeat is older than EXPORT_JOB_STALE_MINUTES. Returns how many."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=getattr(settings, 'EXPORT_JOB_STALE_MINUTES', 15))
+    silent = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    return ExportJob.objects.filter(silent, status=ExportJob.RUNNING).update(
+        status=ExportJob.FAILED, error='The export stopped responding.', finished_at=now,
+    )
+
+
+def run_pending():
+    """Run the oldest pending job. Returns True/False for ready/failed, None if none was pending."""
+    close_old_connections()
+    fail_stale()
+    job = claim()
+    return None if job is None else run(job)
+
+
+def download_name(job):
+    _, basename = TITLES.get(job.host_role, TITLES[''])
+    return f'{basename}.{exports.FORMATS[job.format][1]}'
+
+
+def cleanup(now=None):
+    """
+    Delete expired jobs with their files, and failed jobs older than the expiry
+    period. Stale running jobs are marked failed first. Returns the number of
+    jobs deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=getattr(settings, 'EXPORT_JOB_EXPIRY_HOURS', 24))
+    fail_stale(now)
+    stale = ExportJob.objects.filter(expires_at__lt=now) | ExportJob.objects.filter(status=ExportJob.FAILED, created_at__lt=cutoff)
+    stale_ids = []
+    for job in stale.only('id', 'file').iterator():
+        if job.file:
+            job.file.delete(save=False)
+        stale_ids.append(job.id)
+    return ExportJob.objects.filter(id__in=stale_ids).delete()[0]
@@ -0,0 +1,279 @@
+"""
+Visit exports for the HR and HOS dashboards.
+
+Rows are read with a values() projection iterated in chunks from the
+database cursor, so no model instances are built and memory stays flat
+however much history there is. Workbooks use openpyxl's write-only mode,
+which spills rows to a temporary file instead of keeping cells in memory.
+CSV, NDJSON and Parquet share the same columns and are streamed a chunk at a
+time; Parquet keeps typed columns (UTC timestamps, dates, times) and needs
+the optional pyarrow package.
+"""
+import csv
+import io
+import json
+import tempfile
+from collections import namedtuple
+from itertools import islice
+from operator import itemgetter
+
+import openpyxl
+from django.utils.timezone import localtime
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .models import LEGACY_DAY_COLUMNS, Visitor, VisitRequest
+
+CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TEXT_FORMATS = {'date': '%Y-%m-%d', 'time': '%H:%M', 'datetime': '%Y-%m-%d %H:%M:%S'}
+# ?format= of the export views: (content type, file extension)
+FORMATS = {
+    'xlsx': (XLSX_CONTENT_TYPE, 'xlsx'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+_PERSON_FIELDS = ('first_name', 'last_name', 'username', 'email', 'user_type')
+
+
+class Column(namedtuple('Column', ['name', 'header', 'kind', 'value'])):
+    """
+    An export column: field name (CSV, NDJSON and Parquet), header (Excel),
+    value type ('int', 'str', 'date', 'time' or 'datetime') and getter
+    """
+
+
+def _approver(row):
+    """values() prefix of whoever approved the visit, falling back to the host"""
+    if row['approved_by_id']:
+        return 'approved_by__'
+    return 'host__' if row['host_id'] else None
+
+
+def _approver_name(row):
+    prefix = _approver(row)
+    if prefix is None:
+        return None
+    first_name, last_name = row[prefix + 'first_name'], row[prefix + 'last_name']
+    if first_name or last_name:
+        return f"{first_name or ''} {last_name or ''}".strip()
+    return row[prefix + 'username'] or row[prefix + 'email'] or None
+
+
+def _approver_type(row):
+    prefix = _approver(row)
+    return row[prefix + 'user_type'] if prefix else None
+
+
+def _photo_url(row):
+    name = row['visitor__photo']
+    return Visitor._meta.get_field('photo').storage.url(name) if name else None
+
+
+COLUMNS = [
+    Column('visitor_id', 'Visitor ID', 'int', itemgetter('visitor_id')),
+    Column('first_name', 'First Name', 'str', itemgetter('visitor__first_name')),
+    Column('last_name', 'Last Name', 'str', itemgetter('visitor__last_name')),
+    Column('email', 'Email', 'str', itemgetter('visitor__email')),
+    Column('phone', 'Phone', 'str', itemgetter('visitor__phone')),
+    Column('organization', 'Organization', 'str', itemgetter('visitor__company')),
+    Column('id_proof_type', 'ID Proof Type', 'str', itemgetter('visitor__id_proof_type')),
+    Column('id_proof_number', 'ID Proof Number', 'str', itemgetter('visitor__id_proof_number')),
+    Column('photo_url', 'Photo URL', 'str', _photo_url),
+    Column('reference_employee_name', 'Reference Employee Name', 'str', itemgetter('reference_employee_name')),
+    Column('reference_employee_department', 'Reference Employee Department', 'str', itemgetter('reference_employee_department')),
+    Column('reference_purpose', 'Reference Purpose', 'str', itemgetter('reference_purpose')),
+    Column('start_time', 'Start Time', 'time', itemgetter('start_time')),
+    Column('end_time', 'End Time', 'time', itemgetter('end_time')),
+    Column('valid_upto', 'Valid Upto', 'date', itemgetter('valid_upto')),
+    Column('card_number', 'Visitor Card ID', 'str', itemgetter('visitorcard__card_number')),
+    Column('approved_by', 'Approved By', 'str', _approver_name),
+    Column('approver_type', 'Approver Type', 'str', _approver_type),
+]
+COLUMNS += [
+    Column(f'day_{day}_{kind}', f'Day {day} {label}', 'datetime', itemgetter(f'day_{day}_{kind}'))
+    for day in range(1, LEGACY_DAY_COLUMNS + 1)
+    for kind, label in (('checkin', 'Check In'), ('checkout', 'Check Out'))
+]
+HEADERS = [column.header for column in COLUMNS]
+NAMES = [column.name for column in COLUMNS]
+
+# Everything the column getters read, in one values() projection
+FIELDS = (
+    'visitor_id', 'visitor__first_name', 'visitor__last_name', 'visitor__email', 'visitor__phone',
+    'visitor__company', 'visitor__id_proof_type', 'visitor__id_proof_number', 'visitor__photo',
+    'reference_employee_name', 'reference_employee_department', 'reference_purpose',
+    'start_time', 'end_time', 'valid_upto', 'visitorcard__card_number', 'approved_by_id', 'host_id',
+    *(f'approved_by__{field}' for field in _PERSON_FIELDS),
+    *(f'host__{field}' for field in _PERSON_FIELDS),
+    *(f'day_{day}_{kind}' for day in range(1, LEGACY_DAY_COLUMNS + 1) for kind in ('checkin', 'checkout')),
+)
+
+
+def visit_queryset(host_role=None):
+    """Visits to export, oldest visit date first; host_role limits them to one dashboard"""
+    queryset = VisitRequest.objects.all()
+    if host_role:
+        queryset = queryset.filter(host_role=host_role)
+    return queryset.order_by('visit_date', 'id')
+
+
+def fetch(queryset, chunk_size=CHUNK_SIZE):
+    """values() rows for FIELDS, read from the cursor chunk_size at a time"""
+    return queryset.values(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+def typed_rows(values):
+    """One list of typed column values (None when empty) per values() row"""
+    for row in values:
+        yield [column.value(row) for column in COLUMNS]
+
+
+def as_text(kind, value):
+    """A column value the way the spreadsheet shows it; check-ins in local time"""
+    if value is None:
+        return ''
+    if kind == 'datetime':
+        return localtime(value).strftime(TEXT_FORMATS[kind])
+    if kind in TEXT_FORMATS:
+        return value.strftime(TEXT_FORMATS[kind])
+    return value
+
+
+def write_xlsx(file, title, rows):
+    """Write typed rows to file as a one-sheet workbook, without holding them in memory"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(HEADERS)
+    kinds = [column.kind for column in COLUMNS]
+    empty = True
+    for row in rows:
+        # Empty cells stay None, which write-only sheets skip instead of writing a blank string
+        sheet.append([None if value in (None, '') else as_text(kind, value) for kind, value in zip(kinds, row)])
+        empty = False
+    if empty:
+        sheet.append(['No data found'] + [''] * (len(HEADERS) - 1))
+    workbook.save(file)
+
+
+def xlsx_file(queryset, title):
+    """The workbook for queryset in an unnamed temporary file, rewound for reading"""
+    file = tempfile.TemporaryFile()
+    write_xlsx(file, title, typed_rows(fetch(queryset)))
+    file.seek(0)
+    return file
+
+
+def _batches(rows):
+    rows = iter(rows)
+    while batch := list(islice(rows, CHUNK_SIZE)):
+        yield batch
+
+
+def as_iso(kind, value):
+    """A column value for CSV and NDJSON: ISO 8601, check-ins in local time with their offset"""
+    if value is None:
+        return None
+    if kind == 'datetime':
+        return localtime(value).isoformat()
+    if kind in TEXT_FORMATS:
+        return value.isoformat()
+    return value
+
+
+def _iso_rows(batch, kinds):
+    return [[as_iso(kind, value) for kind, value in zip(kinds, row)] for row in batch]
+
+
+def stream_csv(rows):
+    """CSV text, header first, one chunk of bytes per batch of rows"""
+    kinds = [column.kind for column in COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(NAMES)
+    for batch in _batches(rows):
+        writer.writerows(_iso_rows(batch, kinds))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def stream_ndjson(rows):
+    """One JSON object per line, keyed by column name, one chunk of bytes per batch of rows"""
+    kinds = [column.kind for column in COLUMNS]
+    for batch in _batches(rows):
+        yield ''.join(json.dumps(dict(zip(NAMES, row))) + '\n' for row in _iso_rows(batch, kinds)).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last take()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_schema():
+    types = {
+        'int': pyarrow.int64(),
+        'str': pyarrow.string(),
+        'date': pyarrow.date32(),
+        'time': pyarrow.time64('us'),
+        'datetime': pyarrow.timestamp('us', tz='UTC'),
+    }
+    return pyarrow.schema([(column.name, types[column.kind]) for column in COLUMNS])
+
+
+def stream_parquet(rows):
+    """Parquet bytes with one row group per batch of rows, streamed as each group is written"""
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for batch in _batches(rows):
+            columns = list(zip(*batch))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+            ))
+            yield sink.take()
+    yield sink.take()
+
+
+STREAMS = {'csv': stream_csv, 'ndjson': stream_ndjson, 'parquet': stream_parquet}
+
+
+def stream(fmt, queryset):
+    """Bytes of queryset exported as fmt (csv, ndjson or parquet), chunk by chunk"""
+    return STREAMS[fmt](typed_rows(fetch(queryset)))
+
+
+def write(fmt, file, rows, title='Visitors'):
+    """Write typed rows to file in any of FORMATS"""
+    if fmt == 'xlsx':
+        write_xlsx(file, title, rows)
+        return
+    for chunk in STREAMS[fmt](rows):
+        file.write(chunk)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from visitorapi import export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Delete expired visit exports and their files (run periodically, e.g. from cron).'
+
+    def handle(self, *args, **options):
+        deleted = export_jobs.cleanup()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} export job(s) deleted.'))
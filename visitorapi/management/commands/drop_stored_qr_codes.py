@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from visitorapi.models import VisitorCard
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Move cards with a stored QR file over to on-demand QR images (run once QR_STORE_FILES is off).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-files', action='store_true', help='Also delete the stored image files')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the cards that would change')
+
+    def handle(self, *args, **options):
+        cards = VisitorCard.objects.exclude(qr_code_image='').exclude(qr_code_image__isnull=True)
+        if options['dry_run']:
+            self.stdout.write(f'{cards.count()} card(s) have a stored QR file.')
+            return
+        moved = 0
+        while True:
+            batch = list(cards.order_by('id').only('id', 'qr_code_image')[:BATCH_SIZE])
+            if not batch:
+                break
+            for card in batch:
+                if options['delete_files']:
+                    card.qr_code_image.delete(save=False)
+            # Printed cards keep working: the payload of their stored file is still accepted
+            moved += VisitorCard.objects.filter(id__in=[card.id for card in batch]).update(
+                qr_code_image=None, qr_status=VisitorCard.QR_READY,
+            )
+        self.stdout.write(self.style.SUCCESS(f'{moved} card(s) now use on-demand QR images.'))
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.core.mail import send_mail
-from visitorapi.models import VisitRequest
+from visitorapi.models import VisitAttendance
 from django.conf import settings
 from datetime import datetime, timedelta
 
@@ -12,23 +12,25 @@ class Command(BaseCommand):
         now = timezone.localtime()
         today = now.date()
         overdue_visits = []
-        for visit in VisitRequest.objects.filter(overdue_notification_sent=False):
-            # Determine current day number for multi-day visits
-            day_num = visit.get_current_day_number()
-            if not (1 <= day_num <= 10):
+        # Only open attendance sessions can be overdue; the partial index keeps this lookup small
+        open_sessions = (
+            VisitAttendance.objects.open()
+            .filter(visit_request__overdue_notification_sent=False)
+            .select_related('visit_request__visitor', 'visit_request__host', 'visit_request__created_by')
+        )
+        for session in open_sessions:
+            visit = session.visit_request
+            # Only today's session counts for multi-day visits
+            if session.day_number != visit.get_current_day_number():
                 continue
-            checkin_field = f'day_{day_num}_checkin'
-            checkout_field = f'day_{day_num}_checkout'
-            checkin_time = getattr(visit, checkin_field)
-            checkout_time = getattr(visit, checkout_field)
-            # Only consider if checked in but not checked out
-            if checkin_time and not checkout_time:
-                # Compose today's end datetime (combine visit_date + end_time for today)
-                end_dt = datetime.combine(today, visit.end_time)
-                end_dt = timezone.make_aware(end_dt, timezone.get_current_timezone())
-                if now > end_dt:
-                    overdue_visits.append(visit)
-        for visit in overdue_visits:
+            if not visit.end_time:
+                continue
+            # Compose today's end datetime (combine visit_date + end_time for today)
+            end_dt = datetime.combine(today, visit.end_time)
+            end_dt = timezone.make_aware(end_dt, timezone.get_current_timezone())
+            if now > end_dt:
+                overdue_visits.append((visit, session.checkin_time))
+        for visit, checkin_time in overdue_visits:
             # Gather recipient emails
             recipients = set()
             if visit.host and visit.host.email:
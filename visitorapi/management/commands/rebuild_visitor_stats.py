@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from visitorapi import dashboard, stats
+
+class Command(BaseCommand):
+    help = 'Rebuild the frequent-visitor statistics, or with --recent just roll the 7-day counts forward.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recent', action='store_true', help='Only recount the rolling 7-day window (run daily)')
+
+    def handle(self, *args, **options):
+        if options['recent']:
+            changed = stats.refresh_recent()
+            dashboard.bump_version()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed 7-day counts on {changed} rows.'))
+            return
+        written = stats.rebuild()
+        dashboard.bump_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} visitor stats rows.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from visitorapi import occupancy
+
+class Command(BaseCommand):
+    help = 'Rebuild the on-site occupancy counters from open attendance sessions.'
+
+    def handle(self, *args, **options):
+        before = occupancy.current()['by_host_type']
+        counts = occupancy.rebuild()
+        for host_type in sorted(set(before) | set(counts)):
+            old = before.get(host_type, 0)
+            new = counts.get(host_type, 0)
+            line = f'{host_type}: {new} on site'
+            if old != new:
+                line += f' (was {old})'
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS('Occupancy counters reconciled.'))
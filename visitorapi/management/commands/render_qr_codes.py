@@ -0,0 +1,30 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from visitorapi import qr_jobs
+
+
+class Command(BaseCommand):
+    help = 'Render pending visitor card QR images in batches with a process pool (runs until stopped, or use --once).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Render everything pending, then exit')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Rendering processes')
+        parser.add_argument('--batch-size', type=int, default=qr_jobs.BATCH_SIZE, help='Cards claimed per batch')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when nothing is pending')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                close_old_connections()
+                ready, failed = qr_jobs.render_pending(pool, options['batch_size'])
+                if ready or failed:
+                    self.stdout.write(f'Rendered {ready} QR code(s), {failed} failed.')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        self.stdout.write(self.style.SUCCESS('No pending QR codes.'))
@@ -0,0 +1,44 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from visitorapi import rollups
+from visitorapi.models import VisitAttendance
+
+class Command(BaseCommand):
+    help = 'Update the hourly occupancy rollups (run hourly), or backfill them for a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='Rebuild history instead of the recent hours')
+        parser.add_argument('--since', help='Backfill start date (YYYY-MM-DD); defaults to the first check-in')
+        parser.add_argument('--until', help='Backfill end date (YYYY-MM-DD, exclusive); defaults to now')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days processed per backfill chunk')
+
+    def _parse_date(self, value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def handle(self, *args, **options):
+        if not options['backfill']:
+            rows = rollups.update_recent()
+            self.stdout.write(self.style.SUCCESS(f'Updated {rows} hourly rows.'))
+            return
+
+        if options['since']:
+            since = self._parse_date(options['since'])
+        else:
+            first = VisitAttendance.objects.order_by('checkin_time').values_list('checkin_time', flat=True).first()
+            if first is None:
+                self.stdout.write('No attendance data to roll up.')
+                return
+            since = first
+        until = self._parse_date(options['until']) if options['until'] else timezone.now() + rollups.HOUR
+
+        total = 0
+        for start, end, rows in rollups.backfill(since, until, options['chunk_days']):
+            total += rows
+            self.stdout.write(f'{start:%Y-%m-%d %H:%M} - {end:%Y-%m-%d %H:%M}: {rows} rows')
+        self.stdout.write(self.style.SUCCESS(f'Backfill complete: {total} hourly rows.'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from visitorapi import export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Build queued visit exports one at a time (runs until stopped, or use --once).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Build everything queued, then exit')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when nothing is queued')
+
+    def handle(self, *args, **options):
+        while True:
+            result = export_jobs.run_pending()
+            if result is not None:
+                self.stdout.write('Export ready.' if result else 'Export failed.')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll'])
+        self.stdout.write(self.style.SUCCESS('No queued exports.'))
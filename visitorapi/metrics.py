@@ -0,0 +1,127 @@
+"""
+Latency and outcome metrics for the kiosk scan endpoints, in Prometheus text format.
+
+Each scan is timed per stage (parse, lookup, day, write, response) and in
+total, into fixed-bucket histograms per endpoint and gate; p50/p99 per gate
+come from histogram_quantile() on the scraper side. Kiosks name their gate in
+an X-Kiosk-Id header; only the ids listed in KIOSK_GATES become gate labels
+and anything else is counted as "other", so the series stay bounded.
+Counters are kept per process, so scrape every worker (or run one) to see
+the whole site.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import card_cache, scan_dedupe
+
+# Upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OTHER_GATE = 'other'
+
+_lock = threading.Lock()
+_histograms = {}  # (endpoint, gate, stage) -> [bucket counts..., +Inf count, sum]
+_outcomes = Counter()  # (endpoint, gate, outcome) -> scans
+
+
+def gate_label(kiosk_id):
+    """The gate label for a kiosk id: the id itself if it is listed in KIOSK_GATES, else OTHER_GATE"""
+    return kiosk_id if kiosk_id and kiosk_id in getattr(settings, 'KIOSK_GATES', ()) else OTHER_GATE
+
+
+def _observe(key, seconds):
+    row = _histograms.get(key)
+    if row is None:
+        row = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            row[i] += 1
+            break
+    else:
+        row[len(BUCKETS)] += 1
+    row[-1] += seconds
+
+
+class ScanTimer:
+    """Times the stages of one scan; finish() records them with the outcome"""
+
+    def __init__(self, endpoint, kiosk_id=''):
+        self.endpoint = endpoint
+        self.gate = gate_label(kiosk_id)
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self, outcome):
+        total = time.perf_counter() - self.started
+        with _lock:
+            for name, seconds in self.stages.items():
+                _observe((self.endpoint, self.gate, name), seconds)
+            _observe((self.endpoint, self.gate, 'total'), total)
+            _outcomes[(self.endpoint, self.gate, outcome)] += 1
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _outcomes.clear()
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        histograms = {key: list(row) for key, row in _histograms.items()}
+        outcomes = dict(_outcomes)
+    lines = [
+        '# HELP kiosk_scan_stage_seconds Time spent in each stage of a kiosk scan.',
+        '# TYPE kiosk_scan_stage_seconds histogram',
+    ]
+    for (endpoint, gate, stage), row in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), row):
+            cumulative += count
+            labels = _labels(endpoint=endpoint, gate=gate, stage=stage, le=bound)
+            lines.append(f'kiosk_scan_stage_seconds_bucket{labels} {cumulative}')
+        labels = _labels(endpoint=endpoint, gate=gate, stage=stage)
+        lines.append(f'kiosk_scan_stage_seconds_sum{labels} {row[-1]:.6f}')
+        lines.append(f'kiosk_scan_stage_seconds_count{labels} {cumulative}')
+
+    lines += [
+        '# HELP kiosk_scan_outcomes_total Kiosk scans by result.',
+        '# TYPE kiosk_scan_outcomes_total counter',
+    ]
+    for (endpoint, gate, outcome), count in sorted(outcomes.items()):
+        lines.append(f'kiosk_scan_outcomes_total{_labels(endpoint=endpoint, gate=gate, outcome=outcome)} {count}')
+
+    lines += [
+        '# HELP kiosk_scan_duplicates_absorbed_total Repeat scans answered from the suppression window.',
+        '# TYPE kiosk_scan_duplicates_absorbed_total counter',
+    ]
+    for endpoint, count in sorted(scan_dedupe.absorbed().items()):
+        lines.append(f'kiosk_scan_duplicates_absorbed_total{_labels(endpoint=endpoint)} {count}')
+
+    cache = card_cache.stats()
+    for name, kind, help_text in (
+        ('hits', 'counter', 'Card lookups answered from the cache.'),
+        ('misses', 'counter', 'Card lookups that went to the database.'),
+        ('evictions', 'counter', 'Cards dropped to stay within the size limit.'),
+        ('size', 'gauge', 'Cards currently cached.'),
+    ):
+        metric = f'kiosk_card_cache_{name}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}', f'{metric} {cache[name]}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0022_alter_visitrequest_end_time_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_number', models.PositiveIntegerField()),
+                ('checkin_time', models.DateTimeField()),
+                ('checkout_time', models.DateTimeField(blank=True, null=True)),
+                ('checkout_by_hr', models.BooleanField(default=False)),
+                ('visit_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='visitorapi.visitrequest')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('checkout_time__isnull', True)), fields=['visit_request', 'day_number'], name='visitattendance_open_idx')],
+                'unique_together': {('visit_request', 'day_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+LEGACY_DAY_COLUMNS = 10
+
+
+def backfill_visit_attendance(apps, schema_editor):
+    """
+    Copy day_N_checkin/day_N_checkout pairs into VisitAttendance rows.
+
+    Each batch commits on its own and rows that already exist are skipped, so an
+    interrupted run can simply be started again and picks up where it stopped.
+    """
+    VisitRequest = apps.get_model('visitorapi', 'VisitRequest')
+    VisitAttendance = apps.get_model('visitorapi', 'VisitAttendance')
+
+    has_checkin = models.Q()
+    for day in range(1, LEGACY_DAY_COLUMNS + 1):
+        has_checkin |= models.Q(**{f'day_{day}_checkin__isnull': False})
+
+    day_fields = []
+    for day in range(1, LEGACY_DAY_COLUMNS + 1):
+        day_fields.extend([f'day_{day}_checkin', f'day_{day}_checkout'])
+
+    visits = VisitRequest.objects.filter(has_checkin).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(visits.filter(id__gt=last_id).values('id', 'checkout_by_hr', *day_fields)[:BATCH_SIZE])
+        if not batch:
+            break
+        rows = []
+        for visit in batch:
+            for day in range(1, LEGACY_DAY_COLUMNS + 1):
+                checkin = visit[f'day_{day}_checkin']
+                if checkin is None:
+                    continue
+                checkout = visit[f'day_{day}_checkout']
+                rows.append(VisitAttendance(
+                    visit_request_id=visit['id'],
+                    day_number=day,
+                    checkin_time=checkin,
+                    checkout_time=checkout,
+                    checkout_by_hr=bool(checkout and visit['checkout_by_hr']),
+                ))
+        with transaction.atomic():
+            VisitAttendance.objects.bulk_create(rows, ignore_conflicts=True)
+        last_id = batch[-1]['id']
+
+
+class Migration(migrations.Migration):
+    # Batches commit individually so the backfill can be resumed
+    atomic = False
+
+    dependencies = [
+        ('visitorapi', '0023_visitattendance'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_visit_attendance, migrations.RunPython.noop),
+    ]
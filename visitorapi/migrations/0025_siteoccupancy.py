@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+def seed_occupancy(apps, schema_editor):
+    """Start the counters from the sessions that are already open"""
+    VisitAttendance = apps.get_model('visitorapi', 'VisitAttendance')
+    SiteOccupancy = apps.get_model('visitorapi', 'SiteOccupancy')
+    open_counts = (
+        VisitAttendance.objects.filter(checkout_time__isnull=True)
+        .values_list('visit_request__host__user_type')
+        .annotate(total=models.Count('id'))
+    )
+    for host_type, total in open_counts:
+        SiteOccupancy.objects.update_or_create(host_type=host_type, defaults={'current_count': total})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0024_backfill_visitattendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host_type', models.CharField(max_length=20, unique=True)),
+                ('current_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Site occupancy',
+            },
+        ),
+        migrations.RunPython(seed_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0025_siteoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('checkin', 'Check-in'), ('checkout', 'Check-out'), ('approval', 'Approval'), ('registration', 'Registration')], max_length=20)),
+                ('host_type', models.CharField(max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['host_type', 'id'], name='visitorapi__host_ty_1bd806_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0026_dashboardevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host_type', models.CharField(max_length=20)),
+                ('hour', models.DateTimeField()),
+                ('arrivals', models.PositiveIntegerField(default=0)),
+                ('departures', models.PositiveIntegerField(default=0)),
+                ('peak_concurrent', models.PositiveIntegerField(default=0)),
+                ('total_dwell_seconds', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Hourly occupancy',
+                'indexes': [models.Index(fields=['hour'], name='visitorapi__hour_738b2a_idx')],
+                'unique_together': {('host_type', 'hour')},
+            },
+        ),
+    ]
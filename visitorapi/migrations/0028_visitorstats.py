@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:40
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_visitor_stats(apps, schema_editor):
+    """Build the stats rows from the existing visit requests"""
+    VisitRequest = apps.get_model('visitorapi', 'VisitRequest')
+    VisitorStats = apps.get_model('visitorapi', 'VisitorStats')
+    since = timezone.now() - timedelta(days=7)
+    for group_by, host_type in ((['visitor_id', 'host__user_type'], None), (['visitor_id'], 'ALL')):
+        totals = (
+            VisitRequest.objects.order_by().values(*group_by)
+            .annotate(
+                visit_count=models.Count('id'),
+                recent_count=models.Count('id', filter=models.Q(created_at__gte=since)),
+                last_visit=models.Max('created_at'),
+            )
+        )
+        VisitorStats.objects.bulk_create([
+            VisitorStats(
+                visitor_id=row['visitor_id'],
+                host_type=host_type or row['host__user_type'],
+                visit_count=row['visit_count'],
+                recent_count=row['recent_count'],
+                last_visit=row['last_visit'],
+            )
+            for row in totals.iterator(chunk_size=1000)
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0027_hourlyoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host_type', models.CharField(max_length=20)),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('recent_count', models.PositiveIntegerField(default=0)),
+                ('last_visit', models.DateTimeField(blank=True, null=True)),
+                ('visitor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='visitorapi.visitor')),
+            ],
+            options={
+                'verbose_name_plural': 'Visitor stats',
+                'indexes': [models.Index(fields=['host_type', '-visit_count', '-last_visit'], name='visitorstats_total_idx'), models.Index(fields=['host_type', '-recent_count', '-last_visit'], name='visitorstats_recent_idx')],
+                'unique_together': {('visitor', 'host_type')},
+            },
+        ),
+        migrations.RunPython(seed_visitor_stats, migrations.RunPython.noop),
+    ]
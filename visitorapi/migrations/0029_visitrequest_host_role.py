@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+def backfill_host_role(apps, schema_editor):
+    """Copy each host's user_type onto their visit requests, one UPDATE per host"""
+    HRUser = apps.get_model('visitorapi', 'HRUser')
+    VisitRequest = apps.get_model('visitorapi', 'VisitRequest')
+    for host_id, user_type in HRUser.objects.filter(hosted_visits__isnull=False).distinct().values_list('id', 'user_type'):
+        VisitRequest.objects.filter(host_id=host_id).update(host_role=user_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0028_visitorstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitrequest',
+            name='host_role',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_host_role, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='visitrequest',
+            index=models.Index(fields=['host_role', 'status', 'created_at'], name='visitrequest_role_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitrequest',
+            index=models.Index(fields=['host_role', 'created_at'], name='visitrequest_role_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitrequest',
+            index=models.Index(fields=['host_role', 'visit_date'], name='visitrequest_role_date_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0029_visitrequest_host_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('device_id', models.CharField(max_length=64)),
+                ('action', models.CharField(choices=[('checkin', 'Check-in'), ('checkout', 'Check-out')], max_length=10)),
+                ('card_number', models.CharField(max_length=50)),
+                ('scanned_at', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('result', models.JSONField(default=dict)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+def mark_rendered_cards_ready(apps, schema_editor):
+    """Cards saved before this rendered their QR synchronously"""
+    VisitorCard = apps.get_model('visitorapi', 'VisitorCard')
+    VisitorCard.objects.exclude(qr_code_image='').exclude(qr_code_image__isnull=True).update(qr_status='READY')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0030_scanrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitorcard',
+            name='qr_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10),
+        ),
+        migrations.RunPython(mark_rendered_cards_ready, migrations.RunPython.noop),
+    ]
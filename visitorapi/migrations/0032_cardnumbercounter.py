@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0031_visitorcard_qr_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+    ]
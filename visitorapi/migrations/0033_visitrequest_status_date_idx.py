@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0032_cardnumbercounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitrequest',
+            index=models.Index(fields=['status', 'visit_date'], name='visitrequest_status_date_idx'),
+        ),
+    ]
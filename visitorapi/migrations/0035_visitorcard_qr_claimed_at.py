@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0034_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitorcard',
+            name='qr_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
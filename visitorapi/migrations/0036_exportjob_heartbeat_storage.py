@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:26
+
+import visitorapi.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitorapi', '0035_visitorcard_qr_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=visitorapi.models.export_storage, upload_to='exports/'),
+        ),
+    ]
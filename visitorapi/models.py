@@ -3,10 +3,15 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.conf import settings
 import os
-import qrcode
-from PIL import Image
-from io import BytesIO
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from .qr_payload import digest, for_card
+from .qr_render import render_png
+
+# VisitRequest keeps day_N_checkin/day_N_checkout columns for days 1-10 so
+# exports and older clients keep working; VisitAttendance has no day limit.
+LEGACY_DAY_COLUMNS = 10
 
 class HRUser(AbstractUser):
     USER_TYPE_CHOICES = [
@@ -21,6 +26,19 @@ class HRUser(AbstractUser):
     def __str__(self):
         return f"{self.get_full_name()} ({self.employee_id})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'user_type' in update_fields:
+            # Keep the denormalized VisitRequest.host_role in step
+            if self.hosted_visits.exclude(host_role=self.user_type).update(host_role=self.user_type):
+                # update() sends no signals, so drop cached copies of the old role here
+                from django.db import transaction
+                from . import card_cache, dashboard
+                card_cache.clear()
+                transaction.on_commit(card_cache.clear)
+                dashboard.bump_version()
+
 class Visitor(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -80,6 +98,27 @@ class Visitor(models.Model):
 #     valid_upto = models.DateField(null=True, blank=True)  # New field for request validity
 
 
+class VisitRequestQuerySet(models.QuerySet):
+    def currently_checked_in(self):
+        """
+        Visits with an open attendance session, in a single query.
+        Annotates day_num and checkin_at from the earliest open session and
+        loads only the columns the checked-in lists display.
+        """
+        open_sessions = VisitAttendance.objects.open()
+        earliest_open = open_sessions.filter(visit_request=models.OuterRef('pk')).order_by('day_number')
+        return (
+            self.filter(pk__in=open_sessions.values('visit_request_id'))
+            .annotate(
+                day_num=models.Subquery(earliest_open.values('day_number')[:1]),
+                checkin_at=models.Subquery(earliest_open.values('checkin_time')[:1]),
+            )
+            .select_related('visitor')
+            .only('id', 'purpose', 'visitor__id', 'visitor__first_name', 'visitor__last_name', 'visitor__company')
+            .order_by('checkin_at')
+        )
+
+
 class VisitRequest(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -91,6 +130,7 @@ class VisitRequest(models.Model):
 
     visitor = models.ForeignKey(Visitor, on_delete=models.CASCADE)
     host = models.ForeignKey(HRUser, on_delete=models.CASCADE, related_name='hosted_visits')
+    host_role = models.CharField(max_length=20, blank=True, editable=False)  # copy of host.user_type for filtering
     purpose = models.TextField()
     other_purpose = models.CharField(max_length=255, blank=True, null=True)
     visit_date = models.DateField()
@@ -147,57 +187,91 @@ class VisitRequest(models.Model):
     day_10_checkout = models.DateTimeField(null=True, blank=True)
     overdue_notification_sent = models.BooleanField(default=False)  # New field to track overdue notification
 
+    objects = VisitRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['host_role', 'status', 'created_at'], name='visitrequest_role_status_idx'),
+            models.Index(fields=['host_role', 'created_at'], name='visitrequest_role_created_idx'),
+            models.Index(fields=['host_role', 'visit_date'], name='visitrequest_role_date_idx'),
+            models.Index(fields=['status', 'visit_date'], name='visitrequest_status_date_idx'),
+        ]
+
     def __str__(self):
         return f"Visit by {self.visitor} to {self.host} on {self.visit_date}"
 
-    def get_current_day_number(self):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The host as loaded, so save() only looks up its role when it changed
+        instance._loaded_host_id = instance.__dict__.get('host_id')
+        return instance
+
+    def _host_changed(self):
+        # A deferred host_id was not touched since loading
+        return 'host_id' in self.__dict__ and self.host_id != getattr(self, '_loaded_host_id', None)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        touches_host = update_fields is None or bool({'host', 'host_id', 'host_role'} & set(update_fields))
+        if touches_host and self.host_id and (not self.host_role or self._host_changed()):
+            self.host_role = self.host.user_type
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'host_role'}
+        super().save(*args, **kwargs)
+        self._loaded_host_id = self.__dict__.get('host_id')
+
+    def get_current_day_number(self, grace_days=0):
         """Get the current day number based on visit_date and valid_upto"""
+        from datetime import date
+        return self.get_day_number(date.today(), grace_days)
+
+    def get_day_number(self, on_date, grace_days=0):
+        """
+        Day number of the visit on on_date (0 = before the visit period, -1 = after it).
+        The last day is stretched by grace_days, so a check-out after midnight still counts.
+        """
+        from datetime import timedelta
         if not self.valid_upto:
             return 1
         
-        from datetime import date
-        today = date.today()
         visit_start = self.visit_date
         
-        if today < visit_start:
+        if on_date < visit_start:
             return 0  # Before visit period
         
-        if today > self.valid_upto:
+        if on_date > self.valid_upto:
+            if on_date <= self.valid_upto + timedelta(days=grace_days):
+                return (self.valid_upto - visit_start).days + 1
             return -1  # After visit period
         
         # Calculate day number (1-based)
-        day_diff = (today - visit_start).days
+        day_diff = (on_date - visit_start).days
         return day_diff + 1
 
     def can_check_in_today(self):
         """Check if visitor can check in today"""
         current_day = self.get_current_day_number()
-        return 1 <= current_day <= 10
+        return current_day >= 1
 
     def can_check_out_today(self):
         """Check if visitor can check out today (must be checked in first)"""
         current_day = self.get_current_day_number()
-        if not (1 <= current_day <= 10):
+        if current_day < 1:
             return False
-        
-        # Check if already checked in today
-        checkin_field = f'day_{current_day}_checkin'
-        checkout_field = f'day_{current_day}_checkout'
-        
-        return (getattr(self, checkin_field) is not None and 
-                getattr(self, checkout_field) is None)
+        return self.attendance.open().filter(day_number=current_day).exists()
 
     def get_today_checkin_field(self):
-        """Get the checkin field name for today"""
+        """Get the legacy checkin field name for today (days 1-10 only)"""
         current_day = self.get_current_day_number()
-        if 1 <= current_day <= 10:
+        if 1 <= current_day <= LEGACY_DAY_COLUMNS:
             return f'day_{current_day}_checkin'
         return None
 
     def get_today_checkout_field(self):
-        """Get the checkout field name for today"""
+        """Get the legacy checkout field name for today (days 1-10 only)"""
         current_day = self.get_current_day_number()
-        if 1 <= current_day <= 10:
+        if 1 <= current_day <= LEGACY_DAY_COLUMNS:
             return f'day_{current_day}_checkout'
         return None
 
@@ -208,6 +282,142 @@ class VisitRequest(models.Model):
         if self.checkout_time and not self.day_1_checkout:
             self.day_1_checkout = self.checkout_time
 
+class VisitAttendanceQuerySet(models.QuerySet):
+    def open(self):
+        """Sessions that have been checked in but not yet checked out"""
+        return self.filter(checkout_time__isnull=True)
+
+
+class VisitAttendance(models.Model):
+    """One check-in/check-out session per day of a (possibly multi-day) visit"""
+    visit_request = models.ForeignKey(VisitRequest, on_delete=models.CASCADE, related_name='attendance')
+    day_number = models.PositiveIntegerField()
+    checkin_time = models.DateTimeField()
+    checkout_time = models.DateTimeField(null=True, blank=True)
+    checkout_by_hr = models.BooleanField(default=False)
+
+    objects = VisitAttendanceQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ['visit_request', 'day_number']
+        indexes = [
+            # Partial index: "who is on site" only ever looks at open sessions
+            models.Index(
+                fields=['visit_request', 'day_number'],
+                name='visitattendance_open_idx',
+                condition=models.Q(checkout_time__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Day {self.day_number} of {self.visit_request}"
+
+class SiteOccupancy(models.Model):
+    """Running count of open attendance sessions per host type (HR/HOS)"""
+    host_type = models.CharField(max_length=20, unique=True)
+    current_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Site occupancy'
+
+    def __str__(self):
+        return f"{self.host_type}: {self.current_count} on site"
+
+class HourlyOccupancy(models.Model):
+    """Per-hour, per-host-type visitor traffic rolled up from attendance sessions"""
+    host_type = models.CharField(max_length=20)
+    hour = models.DateTimeField()  # start of the hour, local time
+    arrivals = models.PositiveIntegerField(default=0)
+    departures = models.PositiveIntegerField(default=0)
+    peak_concurrent = models.PositiveIntegerField(default=0)
+    total_dwell_seconds = models.BigIntegerField(default=0)  # summed over this hour's departures
+
+    class Meta:
+        unique_together = ['host_type', 'hour']
+        indexes = [models.Index(fields=['hour'])]
+        verbose_name_plural = 'Hourly occupancy'
+
+    def __str__(self):
+        return f"{self.host_type} {self.hour:%Y-%m-%d %H}:00"
+
+    @property
+    def avg_dwell_seconds(self):
+        if not self.departures:
+            return 0
+        return self.total_dwell_seconds // self.departures
+
+class DashboardEvent(models.Model):
+    """Change feed pushed to open HR/HOS dashboards over server-sent events"""
+    EVENT_TYPE_CHOICES = [
+        ('checkin', 'Check-in'),
+        ('checkout', 'Check-out'),
+        ('approval', 'Approval'),
+        ('registration', 'Registration'),
+    ]
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    host_type = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['host_type', 'id'])]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.host_type}) #{self.id}"
+
+class VisitorStats(models.Model):
+    """
+    Per-visitor visit counts for the frequent-visitor leaderboards, one row per
+    host type plus an 'ALL' row. Kept current by the VisitRequest signals.
+    """
+    ALL_HOSTS = 'ALL'
+
+    visitor = models.ForeignKey(Visitor, on_delete=models.CASCADE, related_name='stats')
+    host_type = models.CharField(max_length=20)
+    visit_count = models.PositiveIntegerField(default=0)
+    recent_count = models.PositiveIntegerField(default=0)  # visits in the last 7 days
+    last_visit = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['visitor', 'host_type']
+        indexes = [
+            models.Index(fields=['host_type', '-visit_count', '-last_visit'], name='visitorstats_total_idx'),
+            models.Index(fields=['host_type', '-recent_count', '-last_visit'], name='visitorstats_recent_idx'),
+        ]
+        verbose_name_plural = 'Visitor stats'
+
+    def __str__(self):
+        return f"{self.visitor} ({self.host_type}): {self.visit_count} visits"
+
+class ScanRecord(models.Model):
+    """
+    Outcome of one kiosk scan submitted through the batch endpoint, keyed by the
+    client's idempotency key so a resent scan returns the stored result.
+    """
+    ACTION_CHOICES = [
+        ('checkin', 'Check-in'),
+        ('checkout', 'Check-out'),
+    ]
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    device_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    card_number = models.CharField(max_length=50)
+    scanned_at = models.DateTimeField()  # client timestamp
+    received_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    result = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.action} {self.card_number} from {self.device_id}"
+
+class CardNumberCounter(models.Model):
+    """Next unissued card sequence number; processes reserve blocks from it"""
+    name = models.CharField(max_length=20, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: next {self.next_value}"
+
 class VisitorCard(models.Model):
     CARD_STATUS_CHOICES = [
         ('ACTIVE', 'Active'),
@@ -222,48 +432,114 @@ class VisitorCard(models.Model):
     status = models.CharField(max_length=20, choices=CARD_STATUS_CHOICES, default='ACTIVE')
     issued_by = models.ForeignKey(HRUser, on_delete=models.SET_NULL, null=True)
     qr_code_image = models.ImageField(upload_to='visitor_qrcodes/', null=True, blank=True)
+    # QR images are rendered in the background (render_qr_codes) after the card is saved
+    QR_PENDING = 'PENDING'
+    QR_READY = 'READY'
+    QR_FAILED = 'FAILED'
+    QR_STATUS_CHOICES = [
+        (QR_PENDING, 'Pending'),
+        (QR_READY, 'Ready'),
+        (QR_FAILED, 'Failed'),
+    ]
+    qr_status = models.CharField(max_length=10, choices=QR_STATUS_CHOICES, default=QR_PENDING, db_index=True)
+    # When a render_qr_codes worker took the card; it renders and stores outside any transaction
+    qr_claimed_at = models.DateTimeField(null=True, blank=True)
     printed = models.BooleanField(default=False)    
 
     def __str__(self):
         return f"Card {self.card_number} - {self.visit_request.visitor}"
 
     def save(self, *args, **kwargs):
-        print(f"SAVE CALLED for card_number={self.card_number}")
-        super().save(*args, **kwargs)  # Save first to get a PK
         if not self.qr_code_image:
-            print(f"Generating QR for card_number={self.card_number}")
-            self.generate_and_save_qr_code()
+            self.qr_status = self.initial_qr_status()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def initial_qr_status(cls):
+        # Without stored files the QR is rendered on demand, so it is always ready
+        return cls.QR_PENDING if getattr(settings, 'QR_STORE_FILES', False) else cls.QR_READY
 
     def generate_and_save_qr_code(self):
-        print(f"GENERATE QR CALLED for card_number={self.card_number}")
-        qr_data = f"{self.card_number}|{self.visit_request.visitor}|{self.visit_request.visit_date}"
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=2,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        # Generate QR code with white background
-        img = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
-        datas = img.getdata()
-        newData = []
-        for item in datas:
-            # Make white pixels fully transparent
-            if item[0] > 200 and item[1] > 200 and item[2] > 200:
-                newData.append((255, 255, 255, 0))
-            else:
-                newData.append(item)
-        img.putdata(newData)
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
+        """Render the QR now, in this process (the background worker renders in batches)"""
+        png = render_png(for_card(self))
+        self.store_qr_code(png)
+
+    def store_qr_code(self, png, claimed_at=None):
+        """
+        Save the QR image and mark it ready. With claimed_at, only while the
+        card is still pending under that claim; returns whether it was stored.
+        """
         file_name = f"qr_{self.card_number}.png"
-        self.qr_code_image.save(file_name, ContentFile(buffer.getvalue()), save=False)
-        super().save(update_fields=['qr_code_image'])
+        self.qr_code_image.save(file_name, ContentFile(png), save=False)
+        cards = VisitorCard.objects.filter(id=self.id)
+        if claimed_at is not None:
+            cards = cards.filter(qr_status=self.QR_PENDING, qr_claimed_at=claimed_at)
+        # update() rather than save(): the image changes nothing the scan caches or dashboards show
+        if not cards.update(qr_code_image=self.qr_code_image.name, qr_status=self.QR_READY):
+            # Rendered by someone else meanwhile; drop the file stored above
+            self.qr_code_image.delete(save=False)
+            return False
+        self.qr_status = self.QR_READY
+        return True
+
+    def qr_image_url(self, fmt='svg'):
+        """URL of the QR rendered on demand; it changes whenever the payload does"""
+        payload = for_card(self)
+        return reverse('card_qr', kwargs={'card_number': self.card_number, 'token': digest(payload), 'fmt': fmt})
 
     @property
     def qr_code_url(self):
+        # Cards rendered to a stored file before on-demand images keep their file
         if self.qr_code_image:
             return self.qr_code_image.url
+        if self.qr_status == self.QR_READY:
+            return self.qr_image_url()
         return ""
+
+def export_storage():
+    """Media storage for export files; Cloudinary only takes non-images as raw uploads"""
+    if getattr(settings, 'DEFAULT_FILE_STORAGE', '').startswith('cloudinary_storage.'):
+        from cloudinary_storage.storage import RawMediaCloudinaryStorage
+        return RawMediaCloudinaryStorage()
+    return default_storage
+
+class ExportJob(models.Model):
+    """
+    A visit export built in the background by the run_export_jobs worker. The
+    finished file is kept in media storage until expires_at.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    READY = 'READY'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+    requested_by = models.ForeignKey(HRUser, on_delete=models.CASCADE, related_name='export_jobs')
+    host_role = models.CharField(max_length=20, blank=True)  # blank exports every host
+    format = models.CharField(max_length=10, default='xlsx')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', storage=export_storage, null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # last sign of life from the running worker
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"Export #{self.id} ({self.format}, {self.status})"
+
+    @property
+    def progress(self):
+        """Share of rows written, 0-100"""
+        if self.status == self.READY:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.rows_done * 100 // self.total_rows)
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import SiteOccupancy, VisitAttendance
+
+
+class SiteAtCapacity(Exception):
+    """Raised when admitting another visitor would exceed SITE_CAPACITY"""
+
+
+def _ensure_row(host_type):
+    SiteOccupancy.objects.get_or_create(host_type=host_type)
+
+
+def admit(host_type, enforce_capacity=False, count=1):
+    """
+    Count more visitors on site (one by default). Must be called inside the transaction
+    that opens the attendance sessions so a refused admission rolls both back.
+    """
+    capacity = getattr(settings, 'SITE_CAPACITY', 0)
+    if enforce_capacity and capacity:
+        _ensure_row(host_type)
+        # Lock every counter so concurrent gates see a consistent site total
+        rows = list(SiteOccupancy.objects.select_for_update().order_by('host_type'))
+        if sum(row.current_count for row in rows) + count > capacity:
+            raise SiteAtCapacity(f'Site is at capacity ({capacity} visitors).')
+    updated = SiteOccupancy.objects.filter(host_type=host_type).update(current_count=F('current_count') + count)
+    if not updated:
+        _ensure_row(host_type)
+        SiteOccupancy.objects.filter(host_type=host_type).update(current_count=F('current_count') + count)
+
+
+def release(host_type):
+    """Count one visitor leaving the site"""
+    SiteOccupancy.objects.filter(host_type=host_type).update(current_count=Greatest(F('current_count') - 1, 0))
+
+
+def current():
+    """Visitors on site per host type, plus the total and configured capacity"""
+    counts = dict(SiteOccupancy.objects.values_list('host_type', 'current_count'))
+    return {
+        'by_host_type': counts,
+        'total': sum(counts.values()),
+        'capacity': getattr(settings, 'SITE_CAPACITY', 0),
+    }
+
+
+def rebuild():
+    """Recompute every counter from the open attendance sessions"""
+    open_counts = dict(
+        VisitAttendance.objects.open()
+        .values_list('visit_request__host_role')
+        .annotate(total=Count('id'))
+    )
+    with transaction.atomic():
+        existing = set(SiteOccupancy.objects.select_for_update().values_list('host_type', flat=True))
+        for host_type in existing | set(open_counts):
+            SiteOccupancy.objects.update_or_create(
+                host_type=host_type,
+                defaults={'current_count': open_counts.get(host_type, 0)},
+            )
+    return open_counts
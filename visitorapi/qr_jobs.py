@@ -0,0 +1,119 @@
+"""
+Background rendering of visitor card QR images.
+
+Saving a card only marks its QR as pending. The render_qr_codes worker claims
+pending cards in batches with a short transaction, then renders them in a
+process pool and stores the images without holding any row locks; each card
+is marked ready only if it is still pending under that claim. The print page
+polls until its cards are ready. Signed payloads are built here, in the
+Django process, so pool workers only run the pure image code.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import VisitorCard
+from .qr_payload import for_card
+from .qr_render import render_png
+
+BATCH_SIZE = 100
+# A claim older than this belongs to a worker that has gone; the cards can be claimed again
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def _render_all(payloads, pool=None):
+    """PNG bytes (or the exception raised) for each payload, in order"""
+    if pool is None:
+        return [_render_one(payload) for payload in payloads]
+    return list(pool.map(_render_one, payloads, chunksize=max(1, len(payloads) // 16)))
+
+
+def _render_one(payload):
+    # Module level so a process pool can pickle it; one bad card must not sink the batch
+    try:
+        return render_png(payload)
+    except Exception as e:
+        return e
+
+
+def render_cards(cards, pool=None, claimed_at=None):
+    """
+    Render and store the QR of each card; with claimed_at, only cards still
+    pending under that claim are updated. Returns (ready, failed) counts.
+    """
+    cards = list(cards)
+    images = _render_all([for_card(card) for card in cards], pool)
+    ready = failed = 0
+    for card, png in zip(cards, images):
+        if isinstance(png, Exception):
+            unfinished = VisitorCard.objects.filter(id=card.id)
+            if claimed_at is not None:
+                unfinished = unfinished.filter(qr_status=VisitorCard.QR_PENDING, qr_claimed_at=claimed_at)
+            failed += unfinished.update(qr_status=VisitorCard.QR_FAILED)
+            continue
+        ready += card.store_qr_code(png, claimed_at)
+    return ready, failed
+
+
+def _unclaimed(cards, now):
+    return cards.filter(Q(qr_claimed_at__isnull=True) | Q(qr_claimed_at__lt=now - CLAIM_TIMEOUT))
+
+
+def claim(batch_size=BATCH_SIZE):
+    """
+    Claim up to batch_size pending cards nobody is rendering. Rows are locked
+    (and skipped by other workers, where supported) only while the claim is
+    stamped. Returns (cards, claimed_at).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            _unclaimed(VisitorCard.objects.filter(qr_status=VisitorCard.QR_PENDING), now)
+            .select_for_update(skip_locked=True)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        VisitorCard.objects.filter(id__in=ids).update(qr_claimed_at=now)
+    cards = VisitorCard.objects.select_related('visit_request').filter(id__in=ids, qr_claimed_at=now).order_by('id')
+    return list(cards), now
+
+
+def render_pending(pool=None, batch_size=BATCH_SIZE):
+    """Claim one batch of pending cards and render it. Returns (ready, failed)."""
+    cards, claimed_at = claim(batch_size)
+    return render_cards(cards, pool, claimed_at)
+
+
+def statuses(card_ids):
+    """{card id: qr image URL, or None while pending, or '' if rendering failed}"""
+    result = {}
+    # On-demand URLs are signed from the card number and visit dates, so load those in the same query
+    cards = VisitorCard.objects.select_related('visit_request').filter(id__in=card_ids).only(
+        'id', 'card_number', 'qr_status', 'qr_code_image', 'visit_request__visit_date', 'visit_request__valid_upto',
+    )
+    for card in cards:
+        if card.qr_status == VisitorCard.QR_READY:
+            result[card.id] = card.qr_code_url
+        else:
+            result[card.id] = '' if card.qr_status == VisitorCard.QR_FAILED else None
+    return result
+
+
+def render_stalled(card_ids, limit=None):
+    """
+    Render the given cards inline if no worker has picked them up: straight
+    away when QR_RENDER_WORKER is off, otherwise once they have been pending
+    for QR_RENDER_FALLBACK_SECONDS since issue. Keeps printing working
+    without a worker.
+    """
+    # Cards a worker is rendering right now are left to it
+    pending = _unclaimed(VisitorCard.objects.select_related('visit_request').filter(
+        id__in=card_ids, qr_status=VisitorCard.QR_PENDING,
+    ), timezone.now())
+    if getattr(settings, 'QR_RENDER_WORKER', False):
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'QR_RENDER_FALLBACK_SECONDS', 30))
+        pending = pending.filter(issued_at__lt=cutoff)
+    limit = limit or getattr(settings, 'QR_RENDER_INLINE_BATCH', 20)
+    return render_cards(pending.order_by('id')[:limit])
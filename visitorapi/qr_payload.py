@@ -0,0 +1,90 @@
+"""
+Signed QR payloads for visitor cards.
+
+V1 format: V1.<card number>.<valid from>.<valid to>.<signature>
+Dates are days since 2000-01-01 in base 36 and the signature is a truncated
+HMAC-SHA256 in base 32, so the whole payload stays in the QR alphanumeric
+character set (uppercase, digits, '-', '.') for the usual VC- card numbers
+and encodes compactly.
+Cards printed before V1 carry "card_number|visitor|visit_date" and are still
+accepted (looked up and validated against the database as before).
+"""
+import base64
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+VERSION = 'V1'
+EPOCH = date(2000, 1, 1)
+SIGNATURE_BYTES = 10
+KEY_SALT = 'visitorapi.qr_payload'
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class InvalidCard(ValueError):
+    """Scanned payload is forged, malformed or outside its validity window"""
+
+
+def _day_code(day):
+    n = (day - EPOCH).days
+    code = ''
+    while True:
+        n, r = divmod(n, 36)
+        code = DIGITS[r] + code
+        if not n:
+            return code
+
+
+def _day_from_code(code):
+    return EPOCH + timedelta(days=int(code, 36))
+
+
+def _signature(message):
+    secret = getattr(settings, 'QR_SIGNING_KEY', None) or settings.SECRET_KEY
+    digest = salted_hmac(KEY_SALT, message, secret=secret, algorithm='sha256').digest()
+    return base64.b32encode(digest[:SIGNATURE_BYTES]).decode().rstrip('=')
+
+
+def encode(card_number, valid_from, valid_to=None):
+    """Signed payload for a card valid from valid_from through valid_to (inclusive)"""
+    message = f'{VERSION}.{card_number}.{_day_code(valid_from)}.{_day_code(valid_to or valid_from)}'
+    return f'{message}.{_signature(message)}'
+
+
+def for_card(card):
+    visit_request = card.visit_request
+    return encode(card.card_number, visit_request.visit_date, visit_request.valid_upto)
+
+
+def digest(payload):
+    """Short digest of a payload; versions the URLs of rendered QR images"""
+    return salted_hmac(f'{KEY_SALT}.image', payload, algorithm='sha256').hexdigest()[:16]
+
+
+def card_number(qr_data, on_date=None, grace_days=0):
+    """
+    Card number from a scanned payload, checked without touching the database.
+    Signed payloads must verify and on_date (default today) must fall inside the
+    card's window, extended by grace_days at the end. Raises InvalidCard.
+    """
+    qr_data = qr_data.strip()
+    if qr_data.startswith(f'{VERSION}.'):
+        parts = qr_data.split('.')
+        if len(parts) < 5:
+            raise InvalidCard('Invalid card.')
+        message = '.'.join(parts[:-1])
+        if not constant_time_compare(parts[-1], _signature(message)):
+            raise InvalidCard('Invalid card.')
+        number, valid_from, valid_to = '.'.join(parts[1:-3]), parts[-3], parts[-2]
+        on_date = on_date or date.today()
+        if on_date < _day_from_code(valid_from):
+            raise InvalidCard('Card is not valid yet.')
+        if on_date > _day_from_code(valid_to) + timedelta(days=grace_days):
+            raise InvalidCard('Your visit date is finished.')
+        return number
+    if qr_data[:1] == 'V' and qr_data[1:2].isdigit() or not getattr(settings, 'QR_ACCEPT_LEGACY', True):
+        # Unknown payload version, or legacy cards have been switched off
+        raise InvalidCard('Invalid card.')
+    # Legacy card printed before signed payloads
+    return qr_data.split('|')[0]
@@ -0,0 +1,78 @@
+"""
+QR code images for visitor cards.
+
+PNGs are written as 1-bit palette images: index 0 is white and fully
+transparent, index 1 is black, so the card background shows through. The
+module matrix becomes a one-pixel-per-module image that Pillow scales up,
+so there is no RGBA copy and no per-pixel pass in Python. SVGs draw each
+horizontal run of dark modules as one path segment on a transparent canvas.
+"""
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from PIL import Image
+
+BOX_SIZE = 10
+BORDER = 2
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+# Rendered images kept per process for the on-demand endpoint
+RENDER_CACHE_SIZE = 512
+_PALETTE = [255, 255, 255, 0, 0, 0]
+
+
+def make_qr(data):
+    # The signed payload is short and alphanumeric; M correction keeps the symbol small
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=BOX_SIZE,
+        border=BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_image(data, box_size=BOX_SIZE):
+    """Two-colour palette image of the QR for data, box_size pixels per module"""
+    matrix = make_qr(data).get_matrix()  # includes the border
+    size = len(matrix)
+    modules = Image.frombytes('P', (size, size), bytes(cell for row in matrix for cell in row))
+    modules.putpalette(_PALETTE)
+    return modules.resize((size * box_size, size * box_size), Image.NEAREST)
+
+
+def render_png(data):
+    """PNG bytes of the QR for data, white transparent"""
+    paletted = render_image(data)
+    buffer = BytesIO()
+    paletted.save(buffer, format="PNG", transparency=0, bits=1, optimize=True)
+    return buffer.getvalue()
+
+
+def render_svg(data):
+    """SVG bytes of the QR for data, one unit per module, background transparent"""
+    matrix = make_qr(data).get_matrix()
+    size = len(matrix)
+    segments = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            segments.append(f'M{start} {y}h{x - start}v1h-{x - start}z')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<path d="{"".join(segments)}" fill="#000"/></svg>'
+    ).encode()
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render(data, fmt):
+    """Cached PNG or SVG bytes of the QR for data (fmt is a CONTENT_TYPES key)"""
+    return render_png(data) if fmt == 'png' else render_svg(data)
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import HourlyOccupancy, VisitAttendance
+
+HOUR = timedelta(hours=1)
+
+
+def floor_hour(value):
+    """Start of the local-time hour containing value"""
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _hour_stats(sessions, start, end):
+    """
+    Sweep the check-in/check-out timestamps of sessions overlapping [start, end)
+    and return {(host_type, hour): stats}.
+    """
+    stats = defaultdict(lambda: {'arrivals': 0, 'departures': 0, 'peak_concurrent': 0, 'total_dwell_seconds': 0})
+    level = defaultdict(int)
+    changes = defaultdict(list)
+    for host_type, checkin, checkout in sessions:
+        if checkin < start:
+            level[host_type] += 1
+        else:
+            changes[host_type].append((checkin, 1))
+            stats[(host_type, floor_hour(checkin))]['arrivals'] += 1
+        if checkout is not None and checkout < end:
+            changes[host_type].append((checkout, -1))
+            row = stats[(host_type, floor_hour(checkout))]
+            row['departures'] += 1
+            row['total_dwell_seconds'] += int((checkout - checkin).total_seconds())
+
+    for host_type in set(level) | set(changes):
+        # Departures sort before arrivals at the same instant
+        events = sorted(changes[host_type])
+        current = level[host_type]
+        i = 0
+        hour = start
+        while hour < end:
+            hour_end = hour + HOUR
+            peak = current
+            while i < len(events) and events[i][0] < hour_end:
+                current += events[i][1]
+                peak = max(peak, current)
+                i += 1
+            if peak:
+                stats[(host_type, hour)]['peak_concurrent'] = peak
+            hour = hour_end
+    return stats
+
+
+def rollup_window(start, end):
+    """Recompute the rollup rows for every hour in [start, end). Returns rows written."""
+    start, end = floor_hour(start), floor_hour(end)
+    if end <= start:
+        return 0
+    sessions = (
+        VisitAttendance.objects
+        .filter(checkin_time__lt=end)
+        .filter(Q(checkout_time__isnull=True) | Q(checkout_time__gte=start))
+        .values_list('visit_request__host_role', 'checkin_time', 'checkout_time')
+        .iterator(chunk_size=2000)
+    )
+    stats = _hour_stats(sessions, start, end)
+    rows = [
+        HourlyOccupancy(host_type=host_type, hour=hour, **values)
+        for (host_type, hour), values in stats.items()
+        if any(values.values())
+    ]
+    with transaction.atomic():
+        HourlyOccupancy.objects.filter(hour__gte=start, hour__lt=end).delete()
+        HourlyOccupancy.objects.bulk_create(rows)
+    return len(rows)
+
+
+def update_recent(lookback_hours=2):
+    """
+    Incremental update: recompute from the last rolled-up hour (minus a small
+    lookback for late check-outs) up to and including the current hour.
+    """
+    now = timezone.now()
+    latest = HourlyOccupancy.objects.order_by('-hour').values_list('hour', flat=True).first()
+    start = (latest if latest else now) - timedelta(hours=lookback_hours)
+    return rollup_window(start, floor_hour(now) + HOUR)
+
+
+def backfill(since, until, chunk_days=7):
+    """Rebuild history in date-bounded chunks; yields (chunk_start, chunk_end, rows) as it goes"""
+    chunk = timedelta(days=chunk_days)
+    start = floor_hour(since)
+    until = floor_hour(until)
+    while start < until:
+        end = min(start + chunk, until)
+        yield start, end, rollup_window(start, end)
+        start = end
@@ -0,0 +1,54 @@
+"""
+Duplicate-scan suppression for the kiosk endpoints.
+
+Scanners often fire the same QR several times in a second. Within a short
+per-endpoint window a repeat scan of a card gets the first scan's response
+back (flagged repeat_scan) instead of running check-in/check-out again.
+Responses are kept in the Django cache, so the window spans workers when
+REDIS_URL is set; the absorbed counters are per process.
+"""
+import threading
+from collections import Counter
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_WINDOWS = {'checkin': 3, 'checkout': 3}
+
+_absorbed = Counter()
+_lock = threading.Lock()
+
+
+def window(endpoint):
+    """Suppression window in seconds for an endpoint (0 turns it off)"""
+    windows = {**DEFAULT_WINDOWS, **getattr(settings, 'SCAN_DEDUPE_SECONDS', {})}
+    return windows.get(endpoint, 0)
+
+
+def _key(endpoint, card_number):
+    return f'scan-dedupe:{endpoint}:{quote(card_number)}'
+
+
+def previous(endpoint, card_number):
+    """The response given to this card at this endpoint within the window, or None"""
+    if not window(endpoint):
+        return None
+    result = cache.get(_key(endpoint, card_number))
+    if result is None:
+        return None
+    with _lock:
+        _absorbed[endpoint] += 1
+    return {**result, 'repeat_scan': True}
+
+
+def remember(endpoint, card_number, result):
+    seconds = window(endpoint)
+    if seconds:
+        cache.set(_key(endpoint, card_number), result, seconds)
+
+
+def absorbed():
+    """Repeat scans answered from the window in this process, per endpoint"""
+    with _lock:
+        return {endpoint: _absorbed[endpoint] for endpoint in {*DEFAULT_WINDOWS, *_absorbed}}
@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import localtime
+
+from . import attendance, qr_payload
+from .models import ScanRecord, VisitorCard
+
+ACTIONS = ('checkin', 'checkout')
+# Scans stamped further ahead of the server clock than this are refused
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Prune old idempotency records once every this many inserts
+PRUNE_EVERY = 500
+
+
+class InvalidScan(ValueError):
+    """A queued scan that is missing fields or malformed"""
+
+
+def _parse(raw, default_device_id):
+    if not isinstance(raw, dict):
+        raise InvalidScan('Scan must be an object')
+    key = str(raw.get('idempotency_key') or '').strip()
+    if not key or len(key) > 64:
+        raise InvalidScan('idempotency_key is required (max 64 characters)')
+    action = raw.get('action')
+    if action not in ACTIONS:
+        raise InvalidScan("action must be 'checkin' or 'checkout'")
+    qr_data = str(raw.get('qr_data') or '').strip()
+    if not qr_data:
+        raise InvalidScan('No QR data provided')
+    scanned_at = parse_datetime(str(raw.get('scanned_at') or ''))
+    if scanned_at is None:
+        raise InvalidScan('scanned_at must be an ISO 8601 timestamp')
+    if timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    if scanned_at > timezone.now() + MAX_CLOCK_SKEW:
+        raise InvalidScan('scanned_at is in the future')
+    try:
+        # Checked against the scan time, with a day's grace for checkouts past midnight
+        card_number = qr_payload.card_number(
+            qr_data, on_date=localtime(scanned_at).date(),
+            grace_days=attendance.CHECKOUT_GRACE_DAYS if action == 'checkout' else 0,
+        )
+    except qr_payload.InvalidCard as e:
+        raise InvalidScan(str(e))
+    device_id = str(raw.get('device_id') or default_device_id or '')[:64]
+    return {
+        'idempotency_key': key,
+        'action': action,
+        'card_number': card_number[:50],
+        'scanned_at': scanned_at,
+        'device_id': device_id,
+    }
+
+
+def _apply(scan, card):
+    """Apply one scan at its client timestamp; returns the result dict stored for it"""
+    if card is None:
+        return {'success': False, 'error': 'Card not found'}
+    visit_request = card.visit_request
+    scanned_at = scan['scanned_at']
+    grace_days = attendance.CHECKOUT_GRACE_DAYS if scan['action'] == 'checkout' else 0
+    day_number = visit_request.get_day_number(localtime(scanned_at).date(), grace_days)
+    if scan['action'] == 'checkin':
+        if visit_request.valid_upto and localtime(scanned_at).date() > visit_request.valid_upto:
+            return {'success': False, 'error': 'Your visit date is finished.'}
+        if day_number < 1:
+            return {'success': False, 'error': 'Cannot check in. Visit period is not valid for today.'}
+        # The visitor already walked in, so an offline scan is not refused for capacity
+        session = attendance.check_in(visit_request, day_number, when=scanned_at)
+        if session is None:
+            return {'success': False, 'error': 'Already checked in today.'}
+        return {'success': True, 'message': 'Checked in!', 'checkin_time': localtime(scanned_at).strftime('%Y-%m-%d %H:%M:%S')}
+    if day_number < 1:
+        return {'success': False, 'error': 'Invalid visit period.'}
+    if attendance.check_out(visit_request, day_number, when=scanned_at) is None:
+        return {'success': False, 'error': 'Cannot check out. Either not checked in today or already checked out.'}
+    return {'success': True, 'message': 'Checked out!', 'checkout_time': localtime(scanned_at).strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def _prune(records):
+    if not any(record.id and record.id % PRUNE_EVERY == 0 for record in records):
+        return
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'SCAN_RECORD_RETENTION_DAYS', 7))
+    ScanRecord.objects.filter(received_at__lt=cutoff).delete()
+
+
+def _ingest_once(parsed):
+    """
+    Apply the scans whose keys are not recorded yet. Reads and the ScanRecord
+    insert are batched; each scan's check-in/out stays its own conditional
+    UPDATE, because that UPDATE is what decides the race with live kiosk scans
+    and the scans of one card depend on each other in time order.
+    """
+    keys = [scan['idempotency_key'] for scan in parsed if scan]
+    with transaction.atomic():
+        seen = {record.idempotency_key: record.result for record in ScanRecord.objects.filter(idempotency_key__in=keys)}
+        fresh = {}
+        for scan in parsed:
+            if scan and scan['idempotency_key'] not in seen:
+                fresh.setdefault(scan['idempotency_key'], scan)
+        cards = {
+            card.card_number: card
+            for card in VisitorCard.objects.select_related('visit_request__visitor')
+            .filter(card_number__in={scan['card_number'] for scan in fresh.values()})
+        }
+        records = []
+        # Scans for the same card must land in the order they happened
+        for scan in sorted(fresh.values(), key=lambda s: s['scanned_at']):
+            result = _apply(scan, cards.get(scan['card_number']))
+            seen[scan['idempotency_key']] = result
+            records.append(ScanRecord(result=result, **scan))
+        records = ScanRecord.objects.bulk_create(records)
+        _prune(records)
+    return seen, set(fresh)
+
+
+def ingest(raw_scans, default_device_id=''):
+    """
+    Apply a batch of queued kiosk scans in one transaction and return one
+    result per scan, in request order. A scan whose idempotency key was seen
+    before gets its stored result back (replayed) instead of being applied again.
+    """
+    parsed, errors = [], {}
+    for index, raw in enumerate(raw_scans):
+        try:
+            parsed.append(_parse(raw, default_device_id))
+        except InvalidScan as e:
+            parsed.append(None)
+            errors[index] = str(e)
+    keys = {scan['idempotency_key'] for scan in parsed if scan}
+    recorded = -1
+    while True:
+        try:
+            outcomes, applied = _ingest_once(parsed)
+            break
+        except IntegrityError:
+            # A concurrent resend committed some of these keys first. The next pass
+            # replays their stored results, so every conflict leaves fewer scans to apply.
+            now_recorded = ScanRecord.objects.filter(idempotency_key__in=keys).count()
+            if now_recorded <= recorded:
+                raise
+            recorded = now_recorded
+    results = []
+    for index, scan in enumerate(parsed):
+        if scan is None:
+            raw = raw_scans[index]
+            key = raw.get('idempotency_key') if isinstance(raw, dict) else None
+            results.append({'idempotency_key': key, 'success': False, 'error': errors[index], 'replayed': False})
+            continue
+        key = scan['idempotency_key']
+        results.append({'idempotency_key': key, **outcomes[key], 'replayed': key not in applied})
+        applied.discard(key)  # a key repeated within the batch is a replay after its first use
+    return results
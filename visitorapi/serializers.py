@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import HRUser, Visitor, VisitRequest, VisitorCard
+from .models import LEGACY_DAY_COLUMNS, HRUser, Visitor, VisitRequest, VisitorCard
 
 class HRUserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,6 +23,10 @@ class VisitRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = VisitRequest
         fields = '__all__'
+        # Check-ins and check-outs are VisitAttendance sessions; the day columns only mirror them
+        read_only_fields = [
+            f'day_{day}_{kind}' for day in range(1, LEGACY_DAY_COLUMNS + 1) for kind in ('checkin', 'checkout')
+        ]
 
 class VisitorCardSerializer(serializers.ModelSerializer):
     visitor_name = serializers.CharField(source='visit_request.visitor.__str__', read_only=True)
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import card_cache, dashboard, stats
+from .models import Visitor, VisitAttendance, VisitorCard, VisitRequest
+
+
+@receiver(post_save, sender=VisitRequest)
+def count_new_visit(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_visit(instance)
+
+
+@receiver(post_delete, sender=VisitRequest)
+def uncount_deleted_visit(sender, instance, **kwargs):
+    stats.forget_visit(instance)
+
+
+# Anything shown on the dashboards; VisitAttendance drives the checked-in list
+@receiver([post_save, post_delete], sender=VisitRequest)
+@receiver([post_save, post_delete], sender=Visitor)
+@receiver([post_save, post_delete], sender=VisitorCard)
+@receiver([post_save, post_delete], sender=VisitAttendance)
+def invalidate_dashboards(sender, **kwargs):
+    dashboard.bump_version()
+
+
+@receiver([post_save, post_delete], sender=VisitRequest)
+@receiver([post_save, post_delete], sender=VisitorCard)
+def invalidate_card_cache(sender, instance, **kwargs):
+    visit_id = instance.id if sender is VisitRequest else instance.visit_request_id
+    card_cache.invalidate_visit(visit_id)
+    # Again after commit, in case a scan re-read the old row in between
+    transaction.on_commit(lambda: card_cache.invalidate_visit(visit_id))
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import VisitRequest, VisitorStats
+
+ALL_HOSTS = VisitorStats.ALL_HOSTS
+RECENT_DAYS = 7
+BATCH_SIZE = 1000
+
+
+def _recent_since():
+    return timezone.now() - timedelta(days=RECENT_DAYS)
+
+
+def record_visit(visit_request):
+    """Count a newly created visit request for its visitor"""
+    created_at = visit_request.created_at
+    for host_type in (visit_request.host_role, ALL_HOSTS):
+        VisitorStats.objects.get_or_create(
+            visitor_id=visit_request.visitor_id,
+            host_type=host_type,
+            defaults={'last_visit': created_at},
+        )
+        VisitorStats.objects.filter(visitor_id=visit_request.visitor_id, host_type=host_type).update(
+            visit_count=F('visit_count') + 1,
+            recent_count=F('recent_count') + 1,
+            last_visit=Greatest('last_visit', Value(created_at)),
+        )
+
+
+def _aggregate(visit_requests, by_host_type):
+    """Per visitor (and host type) totals for the given VisitRequest queryset"""
+    group_by = ['visitor_id', 'host_role'] if by_host_type else ['visitor_id']
+    return (
+        visit_requests.order_by()
+        .values(*group_by)
+        .annotate(
+            visit_count=Count('id'),
+            recent_count=Count('id', filter=Q(created_at__gte=_recent_since())),
+            last_visit=Max('created_at'),
+        )
+    )
+
+
+def forget_visit(visit_request):
+    """
+    Recount a visitor after one of their visit requests was deleted. Only
+    existing rows are touched so a cascading Visitor delete is not disturbed.
+    """
+    remaining = VisitRequest.objects.filter(visitor_id=visit_request.visitor_id)
+    totals = {row['host_role']: row for row in _aggregate(remaining, by_host_type=True)}
+    totals.update({ALL_HOSTS: row for row in _aggregate(remaining, by_host_type=False)})
+    for row in VisitorStats.objects.filter(visitor_id=visit_request.visitor_id):
+        total = totals.get(row.host_type)
+        if total is None:
+            row.delete()
+            continue
+        VisitorStats.objects.filter(id=row.id).update(
+            visit_count=total['visit_count'],
+            recent_count=total['recent_count'],
+            last_visit=total['last_visit'],
+        )
+
+
+def refresh_recent():
+    """
+    Roll the 7-day window forward: recount recent_count from the last week's
+    requests and zero rows whose visits have all aged out. Returns rows changed.
+    """
+    recent = VisitRequest.objects.filter(created_at__gte=_recent_since())
+    counts = {
+        (row['visitor_id'], row['host_role']): row['n']
+        for row in recent.order_by().values('visitor_id', 'host_role').annotate(n=Count('id'))
+    }
+    for row in recent.order_by().values('visitor_id').annotate(n=Count('id')):
+        counts[(row['visitor_id'], ALL_HOSTS)] = row['n']
+    changed = 0
+    with transaction.atomic():
+        stale = VisitorStats.objects.filter(recent_count__gt=0).values_list('id', 'visitor_id', 'host_type', 'recent_count')
+        for stats_id, visitor_id, host_type, recent_count in stale:
+            n = counts.pop((visitor_id, host_type), 0)
+            if n != recent_count:
+                changed += VisitorStats.objects.filter(id=stats_id).update(recent_count=n)
+        # Rows that were at zero but have recent visits again
+        for (visitor_id, host_type), n in counts.items():
+            changed += VisitorStats.objects.filter(visitor_id=visitor_id, host_type=host_type).update(recent_count=n)
+    return changed
+
+
+def rebuild():
+    """Recompute every stats row from the VisitRequest table. Returns rows written."""
+    rows = [
+        VisitorStats(visitor_id=row['visitor_id'], host_type=row['host_role'], visit_count=row['visit_count'],
+                     recent_count=row['recent_count'], last_visit=row['last_visit'])
+        for row in _aggregate(VisitRequest.objects.all(), by_host_type=True).iterator(chunk_size=BATCH_SIZE)
+    ]
+    rows += [
+        VisitorStats(visitor_id=row['visitor_id'], host_type=ALL_HOSTS, visit_count=row['visit_count'],
+                     recent_count=row['recent_count'], last_visit=row['last_visit'])
+        for row in _aggregate(VisitRequest.objects.all(), by_host_type=False).iterator(chunk_size=BATCH_SIZE)
+    ]
+    with transaction.atomic():
+        VisitorStats.objects.all().delete()
+        VisitorStats.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def top_visitors(host_type=ALL_HOSTS, recent=False, limit=10):
+    """
+    Leaderboard of Visitor objects, each given num_visits and last_visit
+    attributes. With recent=True only visits from the last 7 days count.
+    """
+    rows = VisitorStats.objects.filter(host_type=host_type).select_related('visitor')
+    if recent:
+        rows = rows.filter(recent_count__gt=0, last_visit__gte=_recent_since()).order_by('-recent_count', '-last_visit')
+    else:
+        rows = rows.filter(visit_count__gt=0).order_by('-visit_count', '-last_visit')
+    visitors = []
+    for row in rows[:limit]:
+        row.visitor.num_visits = row.recent_count if recent else row.visit_count
+        row.visitor.last_visit = row.last_visit
+        visitors.append(row.visitor)
+    return visitors
@@ -11,6 +11,9 @@ from .views import (
     ajax_password_reset,
     export_visitors_excel,
     export_hos_visitors_excel,
+    start_export_job,
+    export_job_status,
+    export_job_download,
     registration_user_login_view,
     registration_users_list,
     add_registration_user,
@@ -25,15 +28,26 @@ from .views import (
     hos_logout_view,
     print_card_dashboard,
     print_card_step2,
+    print_card_qr_status,
+    print_cards_pdf,
+    card_qr,
     mark_cards_printed,
     clear_print_session,
     delete_unprinted_visit_request,
     upload_visitor_photo,
     checkout_visitor,
     checkin_visitor,
+    scan_batch,
+    card_cache_stats,
+    scan_dedupe_stats,
+    kiosk_metrics,
     checkout_page,
     checked_in_visitors,
     manual_checkout_visitor,
+    site_occupancy,
+    hourly_occupancy,
+    dashboard_events,
+    dashboard_requests,
 )
 from django.contrib.auth import views as auth_views
 
@@ -55,6 +69,9 @@ urlpatterns = [
     path('ajax/password_reset/', ajax_password_reset, name='ajax_password_reset'),
     path('export-visitors-excel/', export_visitors_excel, name='export_visitors_excel'),
     path('export-hos-visitors-excel/', export_hos_visitors_excel, name='export_hos_visitors_excel'),
+    path('exports/', start_export_job, name='start_export_job'),
+    path('exports/<int:job_id>/', export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', export_job_download, name='export_job_download'),
     path('registration-login/', registration_user_login_view, name='registration-login'),
     path('registration-users-list/', registration_users_list, name='registration-users-list'),
     path('add-registration-user/', add_registration_user, name='add-registration-user'),
@@ -69,13 +86,24 @@ urlpatterns = [
     path('hos-logout/', hos_logout_view, name='hos-logout'),
     path('print-card/', print_card_dashboard, name='print_card_dashboard'),
     path('print-card/step-2/', print_card_step2, name='print_card_step2'),
+    path('print-card/qr-status/', print_card_qr_status, name='print_card_qr_status'),
+    path('print-card/pdf/', print_cards_pdf, name='print_cards_pdf'),
+    path('cards/<str:card_number>/qr/<str:token>.<str:fmt>', card_qr, name='card_qr'),
     path('print-card/mark-printed/', mark_cards_printed, name='mark_cards_printed'),
     path('print-card/clear-session/', clear_print_session, name='clear_print_session'),
     path('print-card/delete/<int:visit_id>/', delete_unprinted_visit_request, name='delete_unprinted_visit_request'),
     path('visitors/<int:visitor_id>/upload-photo/', upload_visitor_photo, name='upload_visitor_photo'),
     path('checkout/', checkout_visitor, name='checkout_visitor'),
     path('checkin/', checkin_visitor, name='checkin_visitor'),
+    path('scans/batch/', scan_batch, name='scan_batch'),
+    path('card-cache/stats/', card_cache_stats, name='card_cache_stats'),
+    path('scans/duplicates/', scan_dedupe_stats, name='scan_dedupe_stats'),
+    path('metrics/', kiosk_metrics, name='kiosk_metrics'),
     path('checkout-page/', checkout_page, name='checkout_page'),
     path('checked-in-visitors/', checked_in_visitors, name='checked_in_visitors'),
     path('manual-checkout/', manual_checkout_visitor, name='manual_checkout_visitor'),
+    path('occupancy/', site_occupancy, name='site_occupancy'),
+    path('occupancy/hourly/', hourly_occupancy, name='hourly_occupancy'),
+    path('dashboard-events/', dashboard_events, name='dashboard_events'),
+    path('dashboard/requests/', dashboard_requests, name='dashboard_requests'),
 ] 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from rest_framework import viewsets, permissions
-from .models import HRUser, Visitor, VisitRequest, VisitorCard
+from .models import ExportJob, HRUser, Visitor, VisitRequest, VisitorCard, HourlyOccupancy
+from . import attendance, card_cache, card_numbers, card_pdf, card_printing, dashboard, events, export_jobs, exports, metrics, occupancy, qr_jobs, qr_payload, qr_render, scan_dedupe, scans, stats
 from .serializers import (
     HRUserSerializer, 
     VisitorSerializer, 
@@ -8,20 +9,19 @@ from .serializers import (
     VisitorCardSerializer
 )
 from django.views.generic import TemplateView
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.decorators import action, api_view, permission_classes, parser_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db.models import Count, Max, Q
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.db import models
-import openpyxl
 from django.contrib.auth.forms import PasswordResetForm, SetPasswordForm
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -31,13 +31,16 @@ from django.conf import settings
 from django.urls import reverse
 from django.core.mail import send_mail
 import logging
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied
+from django.utils.crypto import constant_time_compare
 import random
 import string
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.utils.timezone import localtime
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 
 # Create your views here.
 
@@ -87,6 +90,15 @@ class VisitorCardViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(status=status)
         return queryset
 
+    @action(detail=False, methods=['post'], url_path='mark-printed')
+    def mark_printed(self, request):
+        """Mark {"card_ids": [...]} printed, checking their visitors in for day 1"""
+        card_ids = request.data.get('card_ids')
+        if not isinstance(card_ids, list):
+            return Response({'error': 'card_ids must be a list'}, status=400)
+        printed, checked_in = card_printing.mark_printed(card_ids)
+        return Response({'printed': printed, 'checked_in': checked_in})
+
 class VisitorRegistrationView(TemplateView):
     template_name = "visitor_form.html"
 
@@ -96,17 +108,8 @@ def visitor_registration(request):
         logout(request)
         messages.error(request, 'You do not have permission to access this portal.')
         return redirect('registration-login')
-    from django.db.models import Count, Max
-    from .models import Visitor
     # Top 10 frequent visitors
-    frequent_visitors = (
-        Visitor.objects.annotate(
-            num_visits=Count('visitrequest'),
-            last_visit=Max('visitrequest__created_at')
-        )
-        .filter(num_visits__gt=0)
-        .order_by('-num_visits', '-last_visit')[:10]
-    )
+    frequent_visitors = stats.top_visitors()
     return render(request, 'visitor_form.html', {'frequent_visitors': frequent_visitors})
 
 @api_view(['POST'])
@@ -185,7 +188,7 @@ def register_visitor(request):
             valid_upto = None
 
         # Create VisitRequest
-        VisitRequest.objects.create(
+        visit_request = VisitRequest.objects.create(
             visitor=visitor,
             host=host,
             purpose=request.data.get('purpose'),
@@ -204,6 +207,7 @@ def register_visitor(request):
             # Add valid_upto field if present in model
             valid_upto=valid_upto,
         )
+        events.publish_request('registration', visit_request)
 
         return Response({'message': 'Visitor registered successfully. Your request is pending approval.'}, status=status.HTTP_201_CREATED)
     except Exception as e:
@@ -323,51 +327,9 @@ def hr_dashboard_view(request):
         logout(request)
         messages.error(request, 'You do not have permission to access this portal.')
         return redirect('login')
-    now = timezone.now()
-    today = now.date()
-    seven_days_ago = now - timedelta(days=7)
-    pending_requests = VisitRequest.objects.filter(status='PENDING', host__user_type='HR', created_at__gte=seven_days_ago).order_by('-created_at')
-    approved_requests = VisitRequest.objects.filter(status='APPROVED', host__user_type='HR', created_at__gte=seven_days_ago).order_by('-created_at')
-    rejected_requests = VisitRequest.objects.filter(status='REJECTED', host__user_type='HR', created_at__gte=seven_days_ago).order_by('-created_at')
-    # Frequent users: annotate with visit count and last visit date (last 7 days only)
-    recent_visitors = Visitor.objects.filter(visitrequest__host__user_type='HR', visitrequest__created_at__gte=seven_days_ago)
-    frequent_visitors = (
-        recent_visitors.annotate(
-            num_visits=Count('visitrequest', filter=Q(visitrequest__created_at__gte=seven_days_ago, visitrequest__host__user_type='HR')),
-            last_visit=Max('visitrequest__created_at', filter=Q(visitrequest__created_at__gte=seven_days_ago, visitrequest__host__user_type='HR'))
-        )
-        .filter(num_visits__gt=0)
-        .order_by('-num_visits', '-last_visit')[:10]
-    )
-    # Use 7-day filter for all_visits for the 3 buttons, but for checked-in visitors, use all visits
-    all_visits = VisitRequest.objects.select_related('visitor').filter(host__user_type='HR', created_at__gte=seven_days_ago)
-    all_visits_for_checked_in = VisitRequest.objects.select_related('visitor').filter(host__user_type='HR')
-
-    # Checked-in visitors for any day (multi-day aware, no 7-day filter)
-    checked_in_visitors = []
-    for vr in all_visits_for_checked_in:
-        for day_num in range(1, 11):
-            checkin_field = f'day_{day_num}_checkin'
-            checkout_field = f'day_{day_num}_checkout'
-            checkin_time = getattr(vr, checkin_field)
-            checkout_time = getattr(vr, checkout_field)
-            if checkin_time and not checkout_time:
-                checked_in_visitors.append({
-                    'visit': vr,
-                    'day_num': day_num,
-                    'checkin_time': checkin_time
-                })
-                break  # Only add once per visit
-
-    context = {
-        'pending_requests': pending_requests,
-        'approved_requests': approved_requests,
-        'rejected_requests': rejected_requests,
-        'frequent_visitors': frequent_visitors,
-        'user': request.user,
-        'all_visits': all_visits,
-        'checked_in_visitors': checked_in_visitors,
-    }
+    # Pending/approved/rejected and all-visits tabs are loaded page by page from dashboard_requests
+    context = dict(dashboard.cached('HR', 'context', lambda: dashboard.build_context('HR')))
+    context['user'] = request.user
     return render(request, 'hr_dashboard.html', context)
 
 @login_required(login_url='/hos-login/')
@@ -376,47 +338,9 @@ def hos_dashboard_view(request):
         logout(request)
         messages.error(request, 'You do not have permission to access this portal.')
         return redirect('hos-login')
-    now = timezone.now()
-    today = now.date()
-    seven_days_ago = now - timedelta(days=7)
-    pending_requests = VisitRequest.objects.filter(status='PENDING', host__user_type='HOS', created_at__gte=seven_days_ago).order_by('-created_at')
-    approved_requests = VisitRequest.objects.filter(status='APPROVED', host__user_type='HOS', created_at__gte=seven_days_ago).order_by('-created_at')
-    rejected_requests = VisitRequest.objects.filter(status='REJECTED', host__user_type='HOS', created_at__gte=seven_days_ago).order_by('-created_at')
-    all_visits = VisitRequest.objects.select_related('visitor').filter(host__user_type='HOS', created_at__gte=seven_days_ago)
-    all_visits_for_checked_in = VisitRequest.objects.select_related('visitor').filter(host__user_type='HOS')
-    recent_visitors = Visitor.objects.filter(visitrequest__host__user_type='HOS', visitrequest__created_at__gte=seven_days_ago)
-    frequent_visitors = (
-        recent_visitors.annotate(
-            num_visits=Count('visitrequest', filter=Q(visitrequest__created_at__gte=seven_days_ago, visitrequest__host__user_type='HOS')),
-            last_visit=Max('visitrequest__created_at', filter=Q(visitrequest__created_at__gte=seven_days_ago, visitrequest__host__user_type='HOS'))
-        )
-        .filter(num_visits__gt=0)
-        .order_by('-num_visits', '-last_visit')[:10]
-    )
-    # Checked-in visitors for any day (multi-day aware, no 7-day filter)
-    checked_in_visitors = []
-    for vr in all_visits_for_checked_in:
-        for day_num in range(1, 11):
-            checkin_field = f'day_{day_num}_checkin'
-            checkout_field = f'day_{day_num}_checkout'
-            checkin_time = getattr(vr, checkin_field)
-            checkout_time = getattr(vr, checkout_field)
-            if checkin_time and not checkout_time:
-                checked_in_visitors.append({
-                    'visit': vr,
-                    'day_num': day_num,
-                    'checkin_time': checkin_time
-                })
-                break  # Only add once per visit
-    context = {
-        'pending_requests': pending_requests,
-        'approved_requests': approved_requests,
-        'rejected_requests': rejected_requests,
-        'frequent_visitors': frequent_visitors,
-        'user': request.user,
-        'all_visits': all_visits,
-        'checked_in_visitors': checked_in_visitors,
-    }
+    # Pending/approved/rejected and all-visits tabs are loaded page by page from dashboard_requests
+    context = dict(dashboard.cached('HOS', 'context', lambda: dashboard.build_context('HOS')))
+    context['user'] = request.user
     return render(request, 'hos_dashboard.html', context)
 
 @csrf_exempt
@@ -511,6 +435,8 @@ def update_request_status(request, request_id, action):
 
         # Save safely
         visit_request.save()
+        if subject:
+            events.publish_request('approval', visit_request)
 
         # Send email if needed
         if visitor_email and subject and message:
@@ -559,175 +485,88 @@ def update_request_status(request, request_id, action):
     else:
         return redirect('hr-dashboard')
 
-@login_required(login_url='/login/')
-def export_visitors_excel(request):
-    def get_user_display_name(user):
-        if not user:
-            return ""
-        if user.first_name or user.last_name:
-            return f"{user.first_name or ''} {user.last_name or ''}".strip()
-        return user.username or user.email or str(user)
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Visitors'
-    # Header with day-specific columns
-    header = [
-        'Visitor ID', 'First Name', 'Last Name', 'Email', 'Phone', 'Organization',
-        'ID Proof Type', 'ID Proof Number', 'Photo URL',
-        "Reference Employee Name", "Reference Employee Department", "Reference Purpose",
-        'Start Time', 'End Time', 'Valid Upto',
-        'Visitor Card ID', 'Approved By', 'Approver Type'
-    ]
-    
-    # Add day-specific check-in/check-out columns (10 days)
-    for day in range(1, 11):
-        header.extend([f'Day {day} Check In', f'Day {day} Check Out'])
-    
-    ws.append(header)
-    visit_requests = VisitRequest.objects.select_related('visitor', 'approved_by', 'host').prefetch_related('visitorcard').all()
-    if not visit_requests.exists():
-        ws.append(['No data found'] + [''] * (len(header) - 1))
+def _export_response(request, queryset, title, basename):
+    """
+    The export in ?format= (xlsx by default, or csv, ndjson, parquet). Workbooks
+    are built in constant memory, then streamed from their temporary file; the
+    other formats stream straight from the database cursor.
+    """
+    fmt = request.GET.get('format', 'xlsx')
+    if fmt not in exports.FORMATS:
+        return HttpResponse(f"Unknown format. Use one of: {', '.join(exports.FORMATS)}", status=400)
+    if fmt == 'parquet' and exports.pyarrow is None:
+        return HttpResponse('Parquet export needs the pyarrow package', status=501)
+    content_type, extension = exports.FORMATS[fmt]
+    if fmt == 'xlsx':
+        response = FileResponse(exports.xlsx_file(queryset, title), content_type=content_type)
     else:
-        for vr in visit_requests:
-            v = vr.visitor
-            # Get visitor card ID if exists
-            visitor_card_id = ''
-            try:
-                visitor_card = vr.visitorcard
-                visitor_card_id = visitor_card.card_number if visitor_card else ''
-            except:
-                visitor_card_id = ''
-            
-            # Get approver information
-            approver_name = ''
-            approver_type = ''
-            if vr.approved_by:
-                approver_name = get_user_display_name(vr.approved_by)
-                approver_type = vr.approved_by.user_type
-            elif vr.host:
-                approver_name = get_user_display_name(vr.host)
-                approver_type = vr.host.user_type
-            
-            # Base row data
-            row_data = [
-                v.id, v.first_name, v.last_name, v.email, v.phone, v.company,
-                v.id_proof_type, v.id_proof_number,
-                v.photo.url if v.photo else '',
-                vr.reference_employee_name or '',
-                vr.reference_employee_department or '',
-                vr.reference_purpose or '',
-                vr.start_time.strftime('%Y-%m-%d %H:%M') if vr.start_time else '',
-                vr.end_time.strftime('%H:%M') if vr.end_time else '',
-                vr.valid_upto.strftime('%Y-%m-%d') if vr.valid_upto else '',
-                visitor_card_id,
-                approver_name,
-                approver_type
-            ]
-            
-            # Add day-specific check-in/check-out data
-            for day in range(1, 11):
-                checkin_field = f'day_{day}_checkin'
-                checkout_field = f'day_{day}_checkout'
-                
-                checkin_time = getattr(vr, checkin_field)
-                checkout_time = getattr(vr, checkout_field)
-                
-                row_data.append(localtime(checkin_time).strftime('%Y-%m-%d %H:%M:%S') if checkin_time else '')
-                row_data.append(localtime(checkout_time).strftime('%Y-%m-%d %H:%M:%S') if checkout_time else '')
-            
-            ws.append(row_data)
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=visitors.xlsx'
-    wb.save(response)
+        response = StreamingHttpResponse(exports.stream(fmt, queryset), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={basename}.{extension}'
     return response
 
+@login_required(login_url='/login/')
+def export_visitors_excel(request):
+    return _export_response(request, exports.visit_queryset(), 'Visitors', 'visitors')
+
 @login_required(login_url='/hos-login/')
 def export_hos_visitors_excel(request):
     if not is_hos_user(request.user):
         return HttpResponse('Access denied', status=403)
-
-    def get_user_display_name(user):
-        if not user:
-            return ""
-        if user.first_name or user.last_name:
-            return f"{user.first_name or ''} {user.last_name or ''}".strip()
-        return user.username or user.email or str(user)
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'HOS Visitors'
-    # Header with day-specific columns
-    header = [
-        'Visitor ID', 'First Name', 'Last Name', 'Email', 'Phone', 'Organization',
-        'ID Proof Type', 'ID Proof Number', 'Photo URL',
-        "Reference Employee Name", "Reference Employee Department", "Reference Purpose",
-        'Start Time', 'End Time', 'Valid Upto',
-        'Visitor Card ID', 'Approved By', 'Approver Type'
-    ]
-    
-    # Add day-specific check-in/check-out columns (10 days)
-    for day in range(1, 11):
-        header.extend([f'Day {day} Check In', f'Day {day} Check Out'])
-    
-    ws.append(header)
     # Only export visits where HOS is the host
-    visit_requests = VisitRequest.objects.select_related('visitor', 'approved_by', 'host').prefetch_related('visitorcard').filter(host__user_type='HOS')
-    if not visit_requests.exists():
-        ws.append(['No data found'] + [''] * (len(header) - 1))
-    else:
-        for vr in visit_requests:
-            v = vr.visitor
-            # Get visitor card ID if exists
-            visitor_card_id = ''
-            try:
-                visitor_card = vr.visitorcard
-                visitor_card_id = visitor_card.card_number if visitor_card else ''
-            except:
-                visitor_card_id = ''
-
-            # Get approver information
-            approver_name = ''
-            approver_type = ''
-            if vr.approved_by:
-                approver_name = get_user_display_name(vr.approved_by)
-                approver_type = vr.approved_by.user_type
-            elif vr.host:
-                approver_name = get_user_display_name(vr.host)
-                approver_type = vr.host.user_type
-
-            # Base row data
-            row_data = [
-                v.id, v.first_name, v.last_name, v.email, v.phone, v.company,
-                v.id_proof_type, v.id_proof_number,
-                v.photo.url if v.photo else '',
-                vr.reference_employee_name or '',
-                vr.reference_employee_department or '',
-                vr.reference_purpose or '',
-                vr.start_time.strftime('%Y-%m-%d %H:%M') if vr.start_time else '',
-                vr.end_time.strftime('%H:%M') if vr.end_time else '',
-                vr.valid_upto.strftime('%Y-%m-%d') if vr.valid_upto else '',
-                visitor_card_id,
-                approver_name,
-                approver_type
-            ]
-            
-            # Add day-specific check-in/check-out data
-            for day in range(1, 11):
-                checkin_field = f'day_{day}_checkin'
-                checkout_field = f'day_{day}_checkout'
-                
-                checkin_time = getattr(vr, checkin_field)
-                checkout_time = getattr(vr, checkout_field)
-                
-                row_data.append(localtime(checkin_time).strftime('%Y-%m-%d %H:%M:%S') if checkin_time else '')
-                row_data.append(localtime(checkout_time).strftime('%Y-%m-%d %H:%M:%S') if checkout_time else '')
-            
-            ws.append(row_data)
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=hos_visitors.xlsx'
-    wb.save(response)
-    return response
+    return _export_response(request, exports.visit_queryset(host_role='HOS'), 'HOS Visitors', 'hos_visitors')
+
+def _export_job_json(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'format': job.format,
+        'progress': job.progress,
+        'rows_done': job.rows_done,
+        'total_rows': job.total_rows,
+        'download_url': reverse('export_job_download', args=[job.id]) if job.status == ExportJob.READY else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'error': job.error,
+    }
+
+@login_required(login_url='/login/')
+@require_POST
+def start_export_job(request):
+    """Queue a background export (?format=, scope=all|hos); poll the returned status_url"""
+    fmt = request.POST.get('format') or request.GET.get('format', 'xlsx')
+    scope = request.POST.get('scope') or request.GET.get('scope', 'all')
+    if fmt not in exports.FORMATS:
+        return JsonResponse({'error': f"Unknown format. Use one of: {', '.join(exports.FORMATS)}"}, status=400)
+    if fmt == 'parquet' and exports.pyarrow is None:
+        return JsonResponse({'error': 'Parquet export needs the pyarrow package'}, status=501)
+    if scope == 'hos' and not is_hos_user(request.user):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    job = export_jobs.enqueue(request.user, fmt, host_role='HOS' if scope == 'hos' else '')
+    data = _export_job_json(job)
+    data['status_url'] = reverse('export_job_status', args=[job.id])
+    return JsonResponse(data, status=202)
+
+def _own_export_job(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if job.requested_by_id != request.user.id and not request.user.is_staff:
+        raise Http404
+    return job
+
+@login_required(login_url='/login/')
+def export_job_status(request, job_id):
+    # Catches jobs whose thread died with its web process, even without cleanup_export_jobs
+    export_jobs.fail_stale()
+    return JsonResponse(_export_job_json(_own_export_job(request, job_id)))
+
+@login_required(login_url='/login/')
+def export_job_download(request, job_id):
+    """The finished export, read from media storage, until it expires"""
+    job = _own_export_job(request, job_id)
+    if job.status != ExportJob.READY or not job.file:
+        return HttpResponse('Export is not ready', status=404)
+    if job.expires_at and job.expires_at < timezone.now():
+        return HttpResponse('Export has expired', status=410)
+    content_type, _ = exports.FORMATS[job.format]
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=export_jobs.download_name(job), content_type=content_type)
 
 @csrf_exempt
 @api_view(['POST'])
@@ -911,29 +750,55 @@ def clear_all_sessions(request):
     else:
         return render(request, 'clear_sessions_confirm.html')
 
+def _unprinted_page(since, until, cursor=None, limit=None):
+    """
+    One keyset-paginated page of approved visits in [since, until] whose card
+    is not printed yet, newest first. Returns (visit requests, next_cursor).
+    """
+    limit = limit or getattr(settings, 'PRINT_CARD_PAGE_SIZE', 48)
+    printed = VisitorCard.objects.filter(visit_request=models.OuterRef('pk'), printed=True)
+    queryset = VisitRequest.objects.filter(
+        status='APPROVED', visit_date__range=(since, until),
+    ).filter(~models.Exists(printed))
+    if cursor:
+        created_at, visit_id = dashboard.decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=visit_id))
+    page = list(queryset.select_related('visitor', 'visitorcard').order_by('-created_at', '-id')[:limit + 1])
+    next_cursor = dashboard.encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
 def print_card_dashboard(request):
-    # Show all approved VisitRequests where the card is not printed or does not exist yet
-    # Use select_related to optimize database queries and prevent visitor data issues
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    approved_requests = VisitRequest.objects.select_related('visitor').filter(status='APPROVED').order_by('-created_at')
-    requests_with_cards = []
-    
-    # Debug logging to track visitor data
-    for req in approved_requests:
-        logger.info(f"Processing request {req.id}: {req.visitor.first_name} {req.visitor.last_name} (Visitor ID: {req.visitor.id})")
-        visitor_card = getattr(req, 'visitorcard', None)
-        # Exclude if card exists and is printed
-        if visitor_card and visitor_card.printed:
-            continue
-        requests_with_cards.append({
-            'visit_request': req,
-            'visitor_card': visitor_card
-        })
-    
-    logger.info(f"Total requests to display: {len(requests_with_cards)}")
-    return render(request, 'print_card_dashboard.html', {'requests_with_cards': requests_with_cards})
+    """
+    Approved visits whose card is not printed yet. Lists visits dated within
+    PRINT_CARD_DAYS of today (or on ?date=YYYY-MM-DD), a page at a time; the
+    page fetches further pages (?cursor=...) as JSON with the rendered cards.
+    """
+    today = timezone.localdate()
+    day = request.GET.get('date')
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else None
+    except ValueError:
+        day = None
+    since = day or today - timedelta(days=getattr(settings, 'PRINT_CARD_DAYS', 7))
+    until = day or today + timedelta(days=getattr(settings, 'PRINT_CARD_DAYS', 7))
+    cursor = request.GET.get('cursor')
+    try:
+        page, next_cursor = _unprinted_page(since, until, cursor)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    requests_with_cards = [
+        {'visit_request': req, 'visitor_card': getattr(req, 'visitorcard', None)} for req in page
+    ]
+    if cursor:
+        html = render_to_string('print_card_items.html', {'requests_with_cards': requests_with_cards}, request=request)
+        return JsonResponse({'html': html, 'next_cursor': next_cursor})
+    return render(request, 'print_card_dashboard.html', {
+        'requests_with_cards': requests_with_cards,
+        'next_cursor': next_cursor,
+        'selected_date': day,
+        'since': since,
+        'until': until,
+    })
 
 @require_POST
 @csrf_protect
@@ -959,26 +824,30 @@ def print_card_step2(request):
         if not selected_visitor_ids:
             messages.error(request, 'No visitors selected for card printing.')
             return redirect('print_card_dashboard')
-        visitor_card_ids = []
-        for visit_id in selected_visitor_ids:
-            visit_request = VisitRequest.objects.select_related('visitor').filter(id=visit_id, status='APPROVED').first()
-            if not visit_request:
-                continue
-            visitor_card = VisitorCard.objects.filter(visit_request=visit_request).first()
-            if not visitor_card:
-                import random
-                import string
-                while True:
-                    card_number = 'VC-' + ''.join(random.choices(string.digits, k=8))
-                    if not VisitorCard.objects.filter(card_number=card_number).exists():
-                        break
-                visitor_card = VisitorCard(
-                    visit_request=visit_request,
-                    card_number=card_number,
-                    issued_by=request.user if request.user.is_authenticated else None
-                )
-                visitor_card.save()
-            visitor_card_ids.append(visitor_card.id)
+        visits = list(
+            VisitRequest.objects.filter(id__in=selected_visitor_ids, status='APPROVED')
+            .select_related('visitorcard').only('id', 'visitorcard__id')
+        )
+        needing_cards = [visit.id for visit in visits if not hasattr(visit, 'visitorcard')]
+        if needing_cards:
+            issued_by = request.user if request.user.is_authenticated else None
+            qr_status = VisitorCard.initial_qr_status()
+            # A card created concurrently for the same visit wins; ours is skipped
+            VisitorCard.objects.bulk_create([
+                VisitorCard(visit_request_id=visit_id, card_number=card_number, issued_by=issued_by, qr_status=qr_status)
+                for visit_id, card_number in zip(needing_cards, card_numbers.allocate(len(needing_cards)))
+            ], ignore_conflicts=True)
+            # bulk_create sends no post_save
+            dashboard.bump_version()
+        card_ids_by_visit = dict(
+            VisitorCard.objects.filter(visit_request_id__in=[visit.id for visit in visits])
+            .values_list('visit_request_id', 'id')
+        )
+        # Keep the order the visitors were selected in
+        visitor_card_ids = [
+            card_ids_by_visit[int(visit_id)] for visit_id in selected_visitor_ids
+            if int(visit_id) in card_ids_by_visit
+        ]
         request.session['step2_visitor_card_ids'] = visitor_card_ids
     else:
         visitor_card_ids = request.session.get('step2_visitor_card_ids', [])
@@ -993,6 +862,59 @@ def print_card_step2(request):
         'card_count': generated_cards.count()
     })
 
+def print_cards_pdf(request):
+    """The cards on the print page as an A4 PDF, card_pdf.CARDS_PER_SHEET per sheet, streamed"""
+    card_ids = request.session.get('step2_visitor_card_ids', [])
+    cards = list(
+        VisitorCard.objects.select_related('visit_request__visitor').filter(id__in=card_ids, printed=False)
+    )
+    if not cards:
+        messages.error(request, 'No valid visitor cards found for printing.')
+        return redirect('print_card_dashboard')
+    # Same order as the print page
+    position = {card_id: i for i, card_id in enumerate(card_ids)}
+    cards.sort(key=lambda card: position[card.id])
+    response = StreamingHttpResponse(card_pdf.stream(cards, len(cards)), content_type='application/pdf')
+    response['Content-Disposition'] = 'inline; filename="visitor-cards.pdf"'
+    return response
+
+@require_GET
+def card_qr(request, card_number, token, fmt):
+    """
+    Card QR rendered on demand as SVG or PNG. The URL carries a digest of the
+    signed payload, so a response never changes and is cached for a year.
+    The digest is secret: a wrong one, or one from before the visit dates
+    changed, is a 404, and only private caches may keep the image.
+    """
+    if fmt not in qr_render.CONTENT_TYPES:
+        raise Http404
+    entry = card_cache.lookup(card_number)
+    if entry is None:
+        raise Http404
+    payload = qr_payload.encode(card_number, entry.visit_date, entry.valid_upto)
+    current = qr_payload.digest(payload)
+    if not constant_time_compare(token, current):
+        raise Http404
+    etag = f'"{current}.{fmt}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(qr_render.render(payload, fmt), content_type=qr_render.CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+def print_card_qr_status(request):
+    """QR readiness of the cards on the print page (polled until all are ready)"""
+    card_ids = request.session.get('step2_visitor_card_ids', [])
+    # Cards no worker has picked up are rendered here, a small batch per poll
+    qr_jobs.render_stalled(card_ids)
+    cards = qr_jobs.statuses(card_ids)
+    return JsonResponse({
+        'cards': {str(card_id): url for card_id, url in cards.items()},
+        'ready': all(url is not None for url in cards.values()),
+    })
+
 @require_POST
 @csrf_protect
 def mark_card_printed(request):
@@ -1005,9 +927,8 @@ def mark_card_printed(request):
         if not visitor_id or not card_number:
             return JsonResponse({'success': False, 'error': 'Missing visitor_id or card_number'})
         visit_request = VisitRequest.objects.select_related('visitor').get(id=visitor_id, status='APPROVED')
-        # Always set check-in time using day_1_checkin to current time
-        visit_request.day_1_checkin = timezone.now()
-        visit_request.save(update_fields=['day_1_checkin'])
+        # Printing the card checks the visitor in for day 1
+        attendance.check_in(visit_request, 1)
         # Create or update visitor card
         visitor_card, created = VisitorCard.objects.get_or_create(
             visit_request=visit_request,
@@ -1031,28 +952,13 @@ def mark_card_printed(request):
 @require_POST
 @csrf_protect
 def mark_cards_printed(request):
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.warning('mark_cards_printed endpoint called')
     if request.method == 'POST':
         import json
         data = json.loads(request.body)
-        card_ids = data.get('card_ids', [])
-        from visitorapi.models import VisitorCard
-        logger.warning(f'Updating VisitorCards with ids: {card_ids}')
-        updated = VisitorCard.objects.filter(id__in=card_ids).update(printed=True)
-        # Set check-in time for all related VisitRequests using day_1_checkin
-        visitor_cards = VisitorCard.objects.select_related('visit_request').filter(id__in=card_ids)
-        for card in visitor_cards:
-            visit_request = card.visit_request
-            # Use day_1_checkin for initial check-in when card is printed
-            if not visit_request.day_1_checkin:
-                visit_request.day_1_checkin = timezone.now()
-                visit_request.save(update_fields=['day_1_checkin'])
-        print('MARK PRINTED: card_ids sent:', card_ids, 'records updated:', updated)
+        printed, checked_in = card_printing.mark_printed(data.get('card_ids', []))
         if hasattr(request, 'session'):
             request.session.pop('step2_visitor_card_ids', None)
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'printed': printed, 'checked_in': checked_in})
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
 
 @require_POST
@@ -1082,140 +988,253 @@ def upload_visitor_photo(request, visitor_id):
     except Visitor.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Visitor not found'}, status=404)
 
-@csrf_exempt
-def checkout_visitor(request):
-    from visitorapi.models import VisitorCard
-    from django.utils import timezone
-    from django.utils.timezone import localtime
+def _check_out_card(card_number, timer):
+    """Kiosk check-out of one card; returns (outcome, JSON reply)"""
+    # Warm cards are answered from the in-process card cache without a query
+    with timer.stage('lookup'):
+        entry = card_cache.lookup(card_number)
+    if entry is None:
+        return 'not_found', {'success': False, 'error': 'Card not found'}
+    visit_request = entry.visit_request()
+    
+    with timer.stage('day'):
+        current_day = visit_request.get_current_day_number(attendance.CHECKOUT_GRACE_DAYS)
+    if current_day < 1:
+        return 'expired', {'success': False, 'error': 'Invalid visit period.'}
+    
+    # Close today's attendance session (a conditional UPDATE decides the race between gates)
+    with timer.stage('write'):
+        checkout_time = attendance.check_out(visit_request, current_day)
+    if checkout_time is None:
+        return 'not_checked_in', {'success': False, 'error': 'Cannot check out. Either not checked in today or already checked out.'}
+    checkout_time_ist = localtime(checkout_time).strftime('%Y-%m-%d %H:%M:%S')
+    return 'success', {
+        'success': True, 
+        'message': 'Checked out!', 
+        'checkout_time': checkout_time_ist
+    }
+
+def _check_in_card(card_number, timer):
+    """Kiosk check-in of one card; returns (outcome, JSON reply)"""
+    from datetime import date
+    # Warm cards are answered from the in-process card cache without a query
+    with timer.stage('lookup'):
+        entry = card_cache.lookup(card_number)
+    if entry is None:
+        return 'not_found', {'success': False, 'error': 'Card not found'}
+    visit_request = entry.visit_request()
+    with timer.stage('day'):
+        finished = visit_request.valid_upto and date.today() > visit_request.valid_upto
+        current_day = visit_request.get_current_day_number()
+    # Block check-in if today is after valid_upto
+    if finished:
+        return 'expired', {'success': False, 'error': 'Your visit date is finished.'}
+    # Check if visitor can check in today
+    if current_day < 1:
+        return 'expired', {'success': False, 'error': 'Cannot check in. Visit period is not valid for today.'}
+    # Open today's attendance session
+    with timer.stage('write'):
+        try:
+            session = attendance.check_in(visit_request, current_day, enforce_capacity=True)
+        except occupancy.SiteAtCapacity as e:
+            return 'at_capacity', {'success': False, 'error': str(e)}
+    if session is None:
+        return 'already_checked_in', {'success': False, 'error': 'Already checked in today.'}
+    checkin_time_ist = localtime(session.checkin_time).strftime('%Y-%m-%d %H:%M:%S')
+    return 'success', {
+        'success': True, 
+        'message': 'Checked in!', 
+        'checkin_time': checkin_time_ist
+    }
+
+def _kiosk_reply(timer, outcome, result):
+    with timer.stage('response'):
+        response = JsonResponse(result)
+    timer.finish(outcome)
+    return response
+
+def _kiosk_scan(request, endpoint, handle, grace_days=0):
     import json
-    if request.method == 'POST':
+    timer = metrics.ScanTimer(endpoint, request.headers.get('X-Kiosk-Id', ''))
+    if request.method != 'POST':
+        return _kiosk_reply(timer, 'invalid', {'success': False, 'error': 'Invalid request'})
+    with timer.stage('parse'):
         qr_data = request.POST.get('qr_data') or (json.loads(request.body).get('qr_data') if request.body else None)
-        if not qr_data:
-            return JsonResponse({'success': False, 'error': 'No QR data provided'})
-        # Parse card_number from qr_data (split by |)
-        card_number = qr_data.split('|')[0]
+        # Signed cards are verified (and forged or expired ones refused) before any query
         try:
-            card = VisitorCard.objects.select_related('visit_request__visitor').get(card_number=card_number)
-            visit_request = card.visit_request
-            
-            # Check if visitor can check out today
-            if not visit_request.can_check_out_today():
-                return JsonResponse({'success': False, 'error': 'Cannot check out. Either not checked in today or already checked out.'})
-            
-            # Get today's checkout field
-            checkout_field = visit_request.get_today_checkout_field()
-            if not checkout_field:
-                return JsonResponse({'success': False, 'error': 'Invalid visit period.'})
-            
-            # Set checkout time for today
-            setattr(visit_request, checkout_field, timezone.now())
-            visit_request.save(update_fields=[checkout_field])
-            checkout_time_ist = localtime(getattr(visit_request, checkout_field)).strftime('%Y-%m-%d %H:%M:%S')
-            return JsonResponse({
-                'success': True, 
-                'message': 'Checked out!', 
-                'checkout_time': checkout_time_ist
-            })
-        except VisitorCard.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Card not found'})
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
+            card_number = qr_payload.card_number(qr_data, grace_days=grace_days) if qr_data else None
+        except qr_payload.InvalidCard as e:
+            return _kiosk_reply(timer, 'invalid', {'success': False, 'error': str(e)})
+    if not qr_data:
+        return _kiosk_reply(timer, 'invalid', {'success': False, 'error': 'No QR data provided'})
+    # A scanner firing the same card again within the window gets the first reply back
+    result = scan_dedupe.previous(endpoint, card_number)
+    if result is not None:
+        return _kiosk_reply(timer, 'duplicate', result)
+    outcome, result = handle(card_number, timer)
+    scan_dedupe.remember(endpoint, card_number, result)
+    return _kiosk_reply(timer, outcome, result)
+
+@csrf_exempt
+def checkout_visitor(request):
+    return _kiosk_scan(request, 'checkout', _check_out_card, grace_days=attendance.CHECKOUT_GRACE_DAYS)
 
 @csrf_exempt
 def checkin_visitor(request):
-    from visitorapi.models import VisitorCard
-    from django.utils import timezone
-    from django.utils.timezone import localtime
+    return _kiosk_scan(request, 'checkin', _check_in_card)
+
+@csrf_exempt
+@require_POST
+def scan_batch(request):
+    """
+    Batch ingestion for kiosks that queued scans while offline (or send micro-batches):
+    {"device_id": "...", "scans": [{"idempotency_key", "action", "qr_data", "scanned_at", "device_id"?}]}
+    Returns one result per scan; resending a batch is safe.
+    """
     import json
-    if request.method == 'POST':
-        qr_data = request.POST.get('qr_data') or (json.loads(request.body).get('qr_data') if request.body else None)
-        if not qr_data:
-            return JsonResponse({'success': False, 'error': 'No QR data provided'})
-        # Parse card_number from qr_data (split by |)
-        card_number = qr_data.split('|')[0]
-        try:
-            card = VisitorCard.objects.select_related('visit_request__visitor').get(card_number=card_number)
-            visit_request = card.visit_request
-            # Block check-in if today is after valid_upto
-            from datetime import date
-            if visit_request.valid_upto and date.today() > visit_request.valid_upto:
-                return JsonResponse({'success': False, 'error': 'Your visit date is finished.'})
-            # Check if visitor can check in today
-            if not visit_request.can_check_in_today():
-                return JsonResponse({'success': False, 'error': 'Cannot check in. Visit period is not valid for today.'})
-            # Get today's checkin field
-            checkin_field = visit_request.get_today_checkin_field()
-            if not checkin_field:
-                return JsonResponse({'success': False, 'error': 'Invalid visit period.'})
-            # Check if already checked in today
-            if getattr(visit_request, checkin_field) is not None:
-                return JsonResponse({'success': False, 'error': 'Already checked in today.'})
-            # Set checkin time for today
-            setattr(visit_request, checkin_field, timezone.now())
-            visit_request.save(update_fields=[checkin_field])
-            checkin_time_ist = localtime(getattr(visit_request, checkin_field)).strftime('%Y-%m-%d %H:%M:%S')
-            return JsonResponse({
-                'success': True, 
-                'message': 'Checked in!', 
-                'checkin_time': checkin_time_ist
-            })
-        except VisitorCard.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Card not found'})
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    raw_scans = data.get('scans') if isinstance(data, dict) else None
+    if not isinstance(raw_scans, list):
+        return JsonResponse({'success': False, 'error': 'scans must be a list'}, status=400)
+    max_size = getattr(settings, 'SCAN_BATCH_MAX_SIZE', 200)
+    if len(raw_scans) > max_size:
+        return JsonResponse({'success': False, 'error': f'At most {max_size} scans per batch'}, status=400)
+    results = scans.ingest(raw_scans, default_device_id=str(data.get('device_id') or ''))
+    return JsonResponse({'success': True, 'results': results})
 
 def checkout_page(request):
     return render(request, 'checkout.html')
 
 @login_required(login_url='/login/')
 def checked_in_visitors(request):
-    from visitorapi.models import VisitRequest
-    all_visits = VisitRequest.objects.select_related('visitor').all()
     data = []
-    for vr in all_visits:
-        for day_num in range(1, 11):
-            checkin_field = f'day_{day_num}_checkin'
-            checkout_field = f'day_{day_num}_checkout'
-            checkin_time = getattr(vr, checkin_field)
-            checkout_time = getattr(vr, checkout_field)
-            if checkin_time and not checkout_time:
-                data.append({
-                    'id': vr.id,
-                    'name': f"{vr.visitor.first_name} {vr.visitor.last_name}",
-                    'company': vr.visitor.company,
-                    'purpose': vr.purpose,
-                    'checkin_time': checkin_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'day_num': day_num,
-                })
-                break  # Only add once per visit
+    for vr in VisitRequest.objects.currently_checked_in():
+        data.append({
+            'id': vr.id,
+            'name': f"{vr.visitor.first_name} {vr.visitor.last_name}",
+            'company': vr.visitor.company,
+            'purpose': vr.purpose,
+            'checkin_time': vr.checkin_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'day_num': vr.day_num,
+        })
     return JsonResponse({'visitors': data})
 
 @require_POST
 @login_required(login_url='/login/')
 def manual_checkout_visitor(request):
-    from django.utils import timezone
-    from visitorapi.models import VisitRequest
     import json
+    timer = metrics.ScanTimer('manual_checkout')
     try:
-        data = json.loads(request.body)
-        visit_id = data.get('visit_id')
+        with timer.stage('parse'):
+            data = json.loads(request.body)
+            visit_id = data.get('visit_id')
         if not visit_id:
-            return JsonResponse({'success': False, 'error': 'No visit ID provided'})
-        visit = VisitRequest.objects.select_related('visitor').get(id=visit_id)
-        # Find the first day_X_checkin that is set and day_X_checkout is not set
-        checked_out = False
-        for day_num in range(1, 11):
-            checkin_field = f'day_{day_num}_checkin'
-            checkout_field = f'day_{day_num}_checkout'
-            checkin_time = getattr(visit, checkin_field)
-            checkout_time = getattr(visit, checkout_field)
-            if checkin_time and not checkout_time:
-                setattr(visit, checkout_field, timezone.now())
-                visit.checkout_by_hr = True
-                visit.save(update_fields=[checkout_field, 'checkout_by_hr'])
-                checked_out = True
-                return JsonResponse({'success': True, 'checkout_time': getattr(visit, checkout_field).strftime('%Y-%m-%d %H:%M:%S') + ' HR'})
-        if not checked_out:
-            return JsonResponse({'success': False, 'error': 'No active check-in found to check out.'})
+            return _kiosk_reply(timer, 'invalid', {'success': False, 'error': 'No visit ID provided'})
+        with timer.stage('lookup'):
+            visit = VisitRequest.objects.select_related('visitor').get(id=visit_id)
+        # Close the earliest open attendance session
+        with timer.stage('write'):
+            checkout_time = attendance.check_out(visit, by_hr=True)
+        if checkout_time is None:
+            return _kiosk_reply(timer, 'not_checked_in', {'success': False, 'error': 'No active check-in found to check out.'})
+        return _kiosk_reply(timer, 'success', {'success': True, 'checkout_time': checkout_time.strftime('%Y-%m-%d %H:%M:%S') + ' HR'})
     except VisitRequest.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Visit not found'})
+        return _kiosk_reply(timer, 'not_found', {'success': False, 'error': 'Visit not found'})
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)})
+        return _kiosk_reply(timer, 'error', {'success': False, 'error': str(e)})
+
+@login_required(login_url='/login/')
+def site_occupancy(request):
+    """Live on-site headcount per host type from the occupancy counters"""
+    return JsonResponse(occupancy.current())
+
+@user_passes_test(lambda user: user.is_staff, login_url='/login/')
+def card_cache_stats(request):
+    """Hit/miss counters of this process's kiosk card cache"""
+    return JsonResponse(card_cache.stats())
+
+def _metrics_token_ok(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    return bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+def kiosk_metrics(request):
+    """Kiosk scan latency histograms and outcome counters in Prometheus text format (staff or METRICS_TOKEN)"""
+    if not (request.user.is_staff or _metrics_token_ok(request)):
+        if request.user.is_authenticated:
+            raise PermissionDenied
+        return redirect(f"/login/?next={request.path}")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@user_passes_test(lambda user: user.is_staff, login_url='/login/')
+def scan_dedupe_stats(request):
+    """Repeat kiosk scans absorbed by the suppression window in this process"""
+    return JsonResponse({
+        endpoint: {'window_seconds': scan_dedupe.window(endpoint), 'absorbed': count}
+        for endpoint, count in scan_dedupe.absorbed().items()
+    })
+
+@login_required(login_url='/login/')
+def hourly_occupancy(request):
+    """Hourly arrivals/departures/peak/dwell for one day (defaults to today), for staffing charts"""
+    from datetime import datetime
+    day_str = request.GET.get('date')
+    try:
+        day = datetime.strptime(day_str, '%Y-%m-%d').date() if day_str else timezone.localdate()
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date, expected YYYY-MM-DD'}, status=400)
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    rows = HourlyOccupancy.objects.filter(hour__gte=start, hour__lt=start + timedelta(days=1)).order_by('hour', 'host_type')
+    host_type = request.GET.get('host_type')
+    if host_type:
+        rows = rows.filter(host_type=host_type)
+    data = [{
+        'hour': localtime(row.hour).strftime('%Y-%m-%d %H:%M'),
+        'host_type': row.host_type,
+        'arrivals': row.arrivals,
+        'departures': row.departures,
+        'peak_concurrent': row.peak_concurrent,
+        'avg_dwell_minutes': round(row.avg_dwell_seconds / 60, 1),
+    } for row in rows]
+    return JsonResponse({'date': day.isoformat(), 'hours': data})
+
+@login_required(login_url='/login/')
+def dashboard_requests(request):
+    """One page of a dashboard tab (?tab=pending|approved|rejected|all&cursor=...) for the user's role"""
+    user = request.user
+    if not (is_hr_user(user) or is_hos_user(user)):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    tab = request.GET.get('tab', 'pending')
+    if tab not in dashboard.TABS:
+        return JsonResponse({'error': 'Unknown tab'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', dashboard.DEFAULT_PAGE_SIZE))
+        cursor = request.GET.get('cursor')
+        if cursor or limit != dashboard.DEFAULT_PAGE_SIZE:
+            rows, next_cursor = dashboard.tab_page(user.user_type, tab, cursor, limit)
+        else:
+            # First pages are what everyone opens; share them through the dashboard cache
+            rows, next_cursor = dashboard.cached(user.user_type, f'tab:{tab}', lambda: dashboard.tab_page(user.user_type, tab))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
+    return JsonResponse({'results': rows, 'next_cursor': next_cursor})
+
+async def dashboard_events(request):
+    """Server-sent events feed for the HR/HOS dashboards (needs the ASGI server)"""
+    user = await request.auser()
+    if not (is_hr_user(user) or is_hos_user(user)):
+        return HttpResponse('Access denied', status=403)
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would buffer the whole stream; 204 tells EventSource to stop
+        # and the dashboard falls back to fetching on demand.
+        return HttpResponse(status=204)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_id')
+    response = StreamingHttpResponse(
+        events.stream(user.user_type, int(last_id) if last_id and last_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response